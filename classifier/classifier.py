@@ -1,10 +1,17 @@
 import os
 import json
+import time
+import asyncio
+import argparse
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 from typing import Literal, List
-from customer_support.prompt import classification_prompt
+from customer_support.prompt import classification_prompt, classifier_prompt
+from customer_support.classification_cache import ClassificationCache, get_classification_cache, prompt_version
+from customer_support.rate_limiter import RateLimiter, aretry, estimate_tokens
+from customer_support.fast_classifier import CLASSIFIED_BY_FAST_PATH, get_fast_path, ticket_text
+from classifier.ticket_io import iter_tickets, load_done_ids, JsonlWriter
 
 # Load API key
 load_dotenv()
@@ -29,9 +36,70 @@ class TicketClassification(BaseModel):
     priority: Literal["P0", "P1", "P2"]
 
 # Initialize LLM
-llm = ChatOpenAI(temperature=0, model_name="gpt-4o-mini")
+MODEL_NAME = "gpt-4o-mini"
+llm = ChatOpenAI(temperature=0, model_name=MODEL_NAME)
 structured_llm = llm.with_structured_output(TicketClassification)
 
+# Keyed on both classifier prompts so the support agent's entries are shared with ours
+PROMPT_VERSION = prompt_version(classification_prompt + classifier_prompt)
+
+# Rough upper bound on completion tokens for a classification response
+COMPLETION_TOKENS = 60
+
+
+def build_prompt(ticket):
+    return classification_prompt.format(
+        id=ticket["id"],
+        subject=ticket["subject"],
+        body=ticket["body"],
+    )
+
+
+def cache_key(ticket):
+    return ClassificationCache.make_key(ticket_text(ticket["subject"], ticket["body"]), PROMPT_VERSION, MODEL_NAME)
+
+
+def fast_classify(ticket):
+    """Local classification if the fast path is confident, else None."""
+    fast_path = get_fast_path()
+    if fast_path is None:
+        return None
+    labels = fast_path.classify(ticket_text(ticket["subject"], ticket["body"]))
+    if labels is None:
+        return None
+    # Tagged so the fast classifier never retrains on its own output
+    return {**to_record(ticket, labels), **CLASSIFIED_BY_FAST_PATH}
+
+
+def record_llm_labels(ticket, result_dict):
+    """Feed an LLM classification back to the fast path (training data and agreement)."""
+    fast_path = get_fast_path()
+    if fast_path is not None:
+        fast_path.record_llm(ticket_text(ticket["subject"], ticket["body"]), result_dict)
+
+
+def print_fast_path_metrics():
+    fast_path = get_fast_path()
+    if fast_path is not None:
+        print(f"Fast path: {fast_path.metrics()}")
+
+
+def to_record(ticket, result_dict):
+    """Merge a ticket with its classification fields."""
+    result_dict = dict(result_dict)
+
+    # Ensure topic_tags is always a list
+    if isinstance(result_dict["topic_tags"], str):
+        result_dict["topic_tags"] = [result_dict["topic_tags"]]
+
+    return {
+        "id": ticket["id"],
+        "subject": ticket["subject"],
+        "body": ticket["body"],
+        **result_dict
+    }
+
+
 # Classification function
 def classify_tickets(input_file, output_file):
 
@@ -40,40 +108,261 @@ def classify_tickets(input_file, output_file):
         tickets = json.load(f)
 
     results = []
+    cache = get_classification_cache()
 
     for ticket in tickets:
-        ticket_classification_prompt = classification_prompt.format(
-            id=ticket["id"],
-            subject=ticket["subject"],
-            body=ticket["body"],
-        )
-
         print(f"Classifying Ticket ID: {ticket['id']}")
 
-        # Invoke LLM with structured output
-        result = structured_llm.invoke(ticket_classification_prompt)
-        result_dict = result.model_dump()
+        key = cache_key(ticket)
+        cached = cache.get(key)
+        if cached is not None:
+            record = to_record(ticket, cached)
+        else:
+            record = fast_classify(ticket)
+        if record is None:
+            ticket_classification_prompt = build_prompt(ticket)
 
-        # Ensure topic_tags is always a list
-        if isinstance(result_dict["topic_tags"], str):
-            result_dict["topic_tags"] = [result_dict["topic_tags"]]
+            # Invoke LLM with structured output
+            result = structured_llm.invoke(ticket_classification_prompt)
+            cache.put(key, result.model_dump())
+            record_llm_labels(ticket, result.model_dump())
+            record = to_record(ticket, result.model_dump())
 
+        print(f"Structured Response: {record}")
 
-        print(f"Structured Response: {result_dict}")
-
-        results.append({
-            "id": ticket["id"],
-            "subject": ticket["subject"],
-            "body": ticket["body"],
-            **result_dict
-        })
+        results.append(record)
 
  
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=2)
 
     print(f"✅ Classified tickets saved to {output_file}")
+    print(f"Cache: {cache.stats()}")
+    print_fast_path_metrics()
+
+
+async def aclassify_ticket(ticket, limiter, semaphore=None, max_retries=5):
+    """
+    Classify one ticket under the concurrency limit and rate limiter, retrying
+    429/5xx. Cached classifications and confident local predictions are
+    returned without calling the LLM.
+    """
+    cache = get_classification_cache()
+    key = cache_key(ticket)
+    cached = cache.get(key)
+    if cached is not None:
+        return to_record(ticket, cached)
+    record = fast_classify(ticket)
+    if record is not None:
+        return record
+
+    prompt = build_prompt(ticket)
+    tokens = estimate_tokens(prompt) + COMPLETION_TOKENS
+
+    async def call():
+        await limiter.aacquire(tokens)
+        return await structured_llm.ainvoke(prompt)
+
+    if semaphore is None:
+        result = await aretry(call, max_retries=max_retries)
+    else:
+        async with semaphore:
+            result = await aretry(call, max_retries=max_retries)
+    cache.put(key, result.model_dump())
+    record_llm_labels(ticket, result.model_dump())
+    return to_record(ticket, result.model_dump())
+
+
+async def aclassify_all(tickets, concurrency=16, requests_per_minute=500,
+                        tokens_per_minute=200_000, max_retries=5):
+    """
+    Classify tickets concurrently. Results come back in input order; a ticket
+    that still fails after retries is kept with an "error" field instead.
+    """
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    outcomes = await asyncio.gather(
+        *(aclassify_ticket(t, limiter, semaphore, max_retries) for t in tickets),
+        return_exceptions=True,
+    )
+
+    results = []
+    for ticket, outcome in zip(tickets, outcomes):
+        if isinstance(outcome, Exception):
+            print(f" Failed to classify {ticket['id']}: {outcome}")
+            results.append({
+                "id": ticket["id"],
+                "subject": ticket["subject"],
+                "body": ticket["body"],
+                "error": str(outcome),
+            })
+        else:
+            results.append(outcome)
+    return results
+
+
+def errors_path(output_file):
+    """Side file for tickets that could not be classified, next to the output."""
+    return os.path.splitext(output_file)[0] + ".errors.jsonl"
+
+
+def classify_tickets_bulk(input_file, output_file, concurrency=16, requests_per_minute=500,
+                          tokens_per_minute=200_000, max_retries=5):
+    """
+    Bulk variant of classify_tickets: concurrent, rate-limited and retried.
+    Tickets that still fail are left out of `output_file` and appended to its
+    `.errors.jsonl` side file instead.
+    """
+    with open(input_file, "r", encoding="utf-8") as f:
+        tickets = json.load(f)
+
+    print(f"Classifying {len(tickets)} tickets with concurrency={concurrency} ...")
+    start = time.perf_counter()
+    results = asyncio.run(aclassify_all(
+        tickets,
+        concurrency=concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        max_retries=max_retries,
+    ))
+    elapsed = time.perf_counter() - start
+
+    # The output is read as labelled data (app, fast classifier), so failures go to a side file
+    classified = [r for r in results if "error" not in r]
+    failures = [r for r in results if "error" in r]
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(classified, f, indent=2)
+    if failures:
+        with JsonlWriter(errors_path(output_file)) as writer:
+            for record in failures:
+                writer.write(record)
+
+    throughput = len(results) / elapsed if elapsed else 0.0
+    print(f"✅ Classified tickets saved to {output_file}")
+    if failures:
+        print(f"Failed tickets appended to {errors_path(output_file)}")
+    print(f"Throughput: {throughput:.2f} tickets/s over {elapsed:.1f}s, failures: {len(failures)}")
+    print(f"Cache: {get_classification_cache().stats()}")
+    print_fast_path_metrics()
+    return results
+
+
+async def aclassify_stream(tickets, writer, concurrency=16, requests_per_minute=500,
+                           tokens_per_minute=200_000, max_retries=5):
+    """
+    Classify a stream of tickets with `concurrency` workers pulling from a
+    bounded queue, writing each record as soon as it finishes. Returns
+    (classified, failed) counts.
+    """
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"classified": 0, "failed": 0}
+
+    async def worker():
+        while True:
+            ticket = await queue.get()
+            if ticket is None:
+                return
+            try:
+                record = await aclassify_ticket(ticket, limiter, max_retries=max_retries)
+            except Exception as e:
+                # Not written, so the next run picks this ticket up again
+                print(f" Failed to classify {ticket['id']}: {e}")
+                counts["failed"] += 1
+            else:
+                writer.write(record)
+                counts["classified"] += 1
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for ticket in tickets:
+        await queue.put(ticket)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+
+    return counts["classified"], counts["failed"]
+
+
+def classify_tickets_stream(input_file, output_file, concurrency=16, requests_per_minute=500,
+                            tokens_per_minute=200_000, max_retries=5):
+    """
+    Streaming, resumable classification. Reads JSONL or a JSON array
+    incrementally and appends each classified ticket to a JSONL output as it
+    completes. Tickets whose IDs are already in the output are skipped, so an
+    interrupted run can simply be restarted.
+    """
+    if not output_file.endswith(".jsonl"):
+        # Appending lines to a JSON array file would corrupt it for json.load readers
+        raise ValueError(f"Streaming output must be a .jsonl file, got {output_file}")
+    done_ids = load_done_ids(output_file)
+    if done_ids:
+        print(f"Resuming: {len(done_ids)} tickets already in {output_file}")
+
+    pending = (t for t in iter_tickets(input_file) if t["id"] not in done_ids)
+
+    start = time.perf_counter()
+    with JsonlWriter(output_file) as writer:
+        classified, failed = asyncio.run(aclassify_stream(
+            pending,
+            writer,
+            concurrency=concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_retries=max_retries,
+        ))
+    elapsed = time.perf_counter() - start
+
+    throughput = classified / elapsed if elapsed else 0.0
+    print(f"✅ Appended {classified} classified tickets to {output_file}")
+    print(f"Throughput: {throughput:.2f} tickets/s over {elapsed:.1f}s, failures: {failed}")
+    print(f"Cache: {get_classification_cache().stats()}")
+    print_fast_path_metrics()
+    return classified, failed
+
+
+DEFAULT_OUTPUT = "classifier/sample_ticket_c.json"
+# Stream mode appends JSONL, so it must never target the JSON array above
+DEFAULT_STREAM_OUTPUT = "classifier/sample_ticket_c.jsonl"
+
 
 # Run the classification
 if __name__ == "__main__":
-    classify_tickets("classifier/sample_tickets.json", "classifier/sample_ticket_c.json")
+    parser = argparse.ArgumentParser(description="Bulk-classify support tickets")
+    parser.add_argument("--input", default="classifier/sample_tickets.json")
+    parser.add_argument("--output", default=None,
+                        help=f"Defaults to {DEFAULT_OUTPUT}, or {DEFAULT_STREAM_OUTPUT} with --stream")
+    parser.add_argument("--sequential", action="store_true", help="Classify one ticket at a time")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream tickets and append results to a JSONL output, resuming from it if present")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=500, help="Requests per minute")
+    parser.add_argument("--tpm", type=int, default=200_000, help="Tokens per minute")
+    parser.add_argument("--max-retries", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.output is None:
+        args.output = DEFAULT_STREAM_OUTPUT if args.stream and not args.sequential else DEFAULT_OUTPUT
+    elif args.stream and not args.sequential and not args.output.endswith(".jsonl"):
+        parser.error("--stream appends JSON lines; --output must be a .jsonl file")
+
+    if args.sequential:
+        classify_tickets(args.input, args.output)
+    elif args.stream:
+        classify_tickets_stream(
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            max_retries=args.max_retries,
+        )
+    else:
+        classify_tickets_bulk(
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            max_retries=args.max_retries,
+        )
@@ -0,0 +1,116 @@
+import os
+import json
+
+# How much of a JSON array file to read per step when parsing incrementally
+READ_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+def _iter_json_array(f):
+    """Yield the elements of a top-level JSON array one by one without loading the whole file."""
+    buffer = f.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array")
+    buffer = buffer[1:]
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        if buffer:
+            try:
+                item, end = _decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Element continues past the buffer - read more (or fail at EOF)
+                if eof:
+                    raise
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            raise ValueError("Unterminated JSON array")
+
+        chunk = f.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_tickets(path):
+    """
+    Stream tickets from either a JSONL file (one ticket per line) or a JSON
+    array file. Memory stays proportional to a single ticket.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        first = ""
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                first = ch
+                break
+        f.seek(0)
+
+        if first == "[":
+            yield from _iter_json_array(f)
+            return
+
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def load_done_ids(output_path):
+    """IDs of tickets already classified successfully in a JSONL output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crash; that ticket is simply redone.
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+class JsonlWriter:
+    """Append-only JSONL writer that flushes every record so a crash loses at most one line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._ensure_newline_terminated()
+        self.f = open(path, "a", encoding="utf-8")
+
+    def _ensure_newline_terminated(self):
+        # If the previous run died mid-line, start the next record on a fresh line.
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+        if last != b"\n":
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    def write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "cache")
+INDEX_VERSIONS_FILE = os.path.join(CACHE_DIR, "index_versions.json")
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+def read_index_version(index_name: str):
+    """Current version stamp of a vector index, or None if it was never stamped."""
+    try:
+        with open(INDEX_VERSIONS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f).get(index_name)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def mark_index_updated(index_name: str):
+    """Stamp a new version for `index_name`; called by ingest after (re)building the index."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    versions = {}
+    if os.path.exists(INDEX_VERSIONS_FILE):
+        with open(INDEX_VERSIONS_FILE, "r", encoding="utf-8") as f:
+            versions = json.load(f)
+    versions[index_name] = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+
+    tmp = INDEX_VERSIONS_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=2)
+    os.replace(tmp, INDEX_VERSIONS_FILE)
+    return versions[index_name]
+
+
+class AnswerCache:
+    """
+    Semantic cache of RAG answers. A question whose embedding has cosine
+    similarity >= `threshold` with a cached question gets the cached
+    AnswerWithSources back without retrieval or generation. Entries are tied
+    to the index version and dropped as soon as the index is re-ingested.
+    """
+
+    def __init__(self, index_name: str, threshold: float = DEFAULT_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, path: str = None):
+        self.index_name = index_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path or os.path.join(CACHE_DIR, f"answers_{index_name}.sqlite")
+
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+        self.hit_seconds = 0.0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                index_version TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        """Load unit-normalized question vectors into memory for matrix lookups."""
+        self._version = read_index_version(self.index_name)
+        self._conn.execute(
+            "DELETE FROM answers WHERE index_version IS NOT ?", (self._version,)
+        )
+        self._conn.commit()
+
+        rows = self._conn.execute("SELECT id, vector FROM answers ORDER BY id").fetchall()
+        self._ids = [r[0] for r in rows]
+        if rows:
+            self._matrix = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+        else:
+            self._matrix = None
+
+    def _check_version(self):
+        if read_index_version(self.index_name) != self._version:
+            logger.info(f"Index `{self.index_name}` was re-ingested; clearing answer cache")
+            self._load()
+
+    @staticmethod
+    def _normalize(vector):
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def lookup(self, vector):
+        """Return (answer dict, similarity) for the closest cached question, or None."""
+        start = time.perf_counter()
+        with self._lock:
+            self._check_version()
+            if self._matrix is None:
+                return None
+
+            scores = self._matrix @ self._normalize(vector)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                return None
+
+            row = self._conn.execute(
+                "SELECT answer FROM answers WHERE id = ?", (self._ids[best],)
+            ).fetchone()
+        self.hit_seconds += time.perf_counter() - start
+        return json.loads(row[0]), similarity
+
+    def store(self, question: str, vector, answer: dict):
+        v = self._normalize(vector)
+        with self._lock:
+            self._check_version()
+            cur = self._conn.execute(
+                "INSERT INTO answers (question, vector, answer, index_version, created_at) VALUES (?, ?, ?, ?, ?)",
+                (question, v.tobytes(), json.dumps(answer), self._version, time.time()),
+            )
+            self._ids.append(cur.lastrowid)
+            self._matrix = v[None, :] if self._matrix is None else np.vstack([self._matrix, v])
+
+            overflow = len(self._ids) - self.max_entries
+            if overflow > 0:
+                # Oldest first
+                self._conn.executemany("DELETE FROM answers WHERE id = ?", [(i,) for i in self._ids[:overflow]])
+                self._ids = self._ids[overflow:]
+                self._matrix = self._matrix[overflow:]
+            self._conn.commit()
+
+    def record_hit(self):
+        self.hits += 1
+
+    def record_miss(self, seconds: float):
+        """Count a miss and the time retrieval + generation took for it."""
+        self.misses += 1
+        self.miss_seconds += seconds
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        avg_hit = self.hit_seconds / self.hits if self.hits else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_miss_seconds": avg_miss,
+            "avg_hit_seconds": avg_hit,
+            "estimated_seconds_saved": self.hits * max(avg_miss - avg_hit, 0.0),
+        }
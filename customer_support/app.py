@@ -1,7 +1,7 @@
 import streamlit as st
 import json
 import os
-from customer_support_agent import CustomerSupportAgent
+from resources import get_support_agent
 
 BASE_DIR = os.path.dirname(__file__)  
 
@@ -30,8 +30,13 @@ st.title("Atlan Customer Support Agent dummy helpdesk")
 st.subheader("Interactive AI Agent")
 st.markdown("Enter a new ticket or query below to see the AI pipeline in action:")
 
-# Create a single agent instance (outside the form so it's reused)
-agent = CustomerSupportAgent()
+# Shared, warm agent: built once per process and reused by every session and rerun
+@st.cache_resource(show_spinner="Loading support agent...")
+def load_agent():
+    return get_support_agent()
+
+
+agent = load_agent()
 
 # Form for ticket input
 with st.form("ticket_form", clear_on_submit=True):
@@ -43,31 +48,46 @@ with st.form("ticket_form", clear_on_submit=True):
     submit_button = st.form_submit_button("Add ticket and Analyze")
 
     if submit_button and query.strip():
+        analysis = st.container()
+        response = st.container()
+        with response:
+            st.write(" Final Response")
+            answer_box = st.empty()
+            answer_box.write("AI-generated response will appear here.")
+
+        streamed = ""
+        result = {}
         with st.spinner("Processing your ticket..."):
-            result = agent.run_graph(query)
-            if "error" in result:
-                st.error(f"Error occurred: {result['error']}")
-            else:
-                
-                st.write("Internal Analysis")
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Topic", ", ".join(result.get("topic_tags", [])) if result.get("topic_tags") else "N/A")
-                with col2:
-                    st.metric("Sentiment", result.get("sentiment", "N/A"))
-                with col3:
-                    st.metric("Priority", result.get("priority", "N/A"))
-
-                st.write(" Final Response")
+            for kind, payload in agent.stream_graph(query):
+                if kind == "classification":
+                    # Shown while the answer is still being generated
+                    with analysis:
+                        st.write("Internal Analysis")
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Topic", ", ".join(payload.get("topic_tags", [])) if payload.get("topic_tags") else "N/A")
+                        with col2:
+                            st.metric("Sentiment", payload.get("sentiment", "N/A"))
+                        with col3:
+                            st.metric("Priority", payload.get("priority", "N/A"))
+                elif kind == "token":
+                    streamed += payload
+                    answer_box.markdown(f"**AI Response:**\n\n{streamed}▌")
+                else:
+                    result = payload
+
+        if "error" in result:
+            st.error(f"Error occurred: {result['error']}")
+        else:
+            with response:
                 if "answer" in result and result["answer"]:
-                    st.write("**AI Response:**")
-                    st.write(result["answer"].answer)
+                    answer_box.markdown(f"**AI Response:**\n\n{result['answer'].answer}")
                     if hasattr(result["answer"], "sources") and result["answer"].sources:
                         with st.expander("Sources"):
                             for i, source in enumerate(result["answer"].sources, 1):
                                 st.write(f"{i}. {source}")
                 else:
-                    st.write("AI-generated response will appear here.")
+                    answer_box.write("AI-generated response will appear here.")
 
                 # Add ticket to session state
                 new_ticket = {
@@ -83,6 +103,10 @@ with st.form("ticket_form", clear_on_submit=True):
     elif submit_button:
         st.warning("Please enter a query before analyzing.")
 
+# Cache metrics
+with st.sidebar.expander("Cache metrics"):
+    st.json(agent.metrics())
+
 # Dashboard Section
 st.subheader("Bulk Ticket Classification Dashboard")
 st.markdown(
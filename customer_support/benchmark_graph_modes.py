@@ -0,0 +1,65 @@
+import os
+import time
+import argparse
+import tempfile
+import statistics
+import pandas as pd
+
+# Measure the LLM flows themselves: no local fast path in front of the classifier
+os.environ.setdefault("FAST_CLASSIFIER", "0")
+
+from langchain_community.callbacks import get_openai_callback
+from classification_cache import ClassificationCache
+from customer_support_agent import CustomerSupportAgent, GRAPH_MODES
+
+INPUT_CSV_FILE = "evaluation_set.csv"
+
+
+def run_mode(mode: str, questions, index_name: str):
+    """Latency and OpenAI chat usage of every question through one graph mode, caches disabled."""
+    agent = CustomerSupportAgent(index_name=index_name, graph_mode=mode)
+    # Fresh classification cache and no answer cache, so every run pays for its LLM calls
+    agent.classification_cache = ClassificationCache(path=os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+    agent.rag_agent.answer_cache = None
+
+    latencies, usage = [], []
+    for question in questions:
+        with get_openai_callback() as cb:
+            start = time.perf_counter()
+            result = agent.graph.invoke({"question": question})
+            latencies.append(time.perf_counter() - start)
+        usage.append((cb.successful_requests, cb.prompt_tokens, cb.completion_tokens, cb.total_cost))
+        if "error" in result:
+            print(f" [{mode}] error for {question[:60]!r}: {result['error']}")
+
+    n = len(questions)
+    return {
+        "mode": mode,
+        "p50_s": statistics.median(latencies),
+        "mean_s": statistics.fmean(latencies),
+        "llm_calls": sum(u[0] for u in usage) / n,
+        "prompt_tokens": sum(u[1] for u in usage) / n,
+        "completion_tokens": sum(u[2] for u in usage) / n,
+        "cost_usd": sum(u[3] for u in usage) / n,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare latency and cost of the agent's graph modes")
+    parser.add_argument("--questions", default=INPUT_CSV_FILE, help="CSV with the question in the first column")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--index", default="atlandb")
+    parser.add_argument("--modes", nargs="+", default=["sequential", "single_pass"], choices=GRAPH_MODES)
+    args = parser.parse_args()
+
+    questions = pd.read_csv(args.questions, header=None)[0].tolist()[:args.limit]
+    print(f"Running {len(questions)} questions through: {', '.join(args.modes)}")
+
+    rows = [run_mode(mode, questions, args.index) for mode in args.modes]
+
+    print(f"\n{'mode':<12}{'p50 s':>8}{'mean s':>8}{'calls':>7}{'prompt tok':>12}{'compl tok':>11}{'cost $':>10}")
+    for row in rows:
+        print(f"{row['mode']:<12}{row['p50_s']:>8.2f}{row['mean_s']:>8.2f}{row['llm_calls']:>7.2f}"
+              f"{row['prompt_tokens']:>12.0f}{row['completion_tokens']:>11.0f}{row['cost_usd']:>10.4f}")
+    print("\nCalls, tokens and cost are per question and cover chat calls only; "
+          "question embeddings are the same in every mode.")
@@ -0,0 +1,274 @@
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_DIR = os.getenv("LEXICAL_DIR", os.path.join(os.path.dirname(__file__), "data", "lexical"))
+OFFSETS_FILE = "bm25_offsets.npy"
+POSTINGS_FILE = "bm25_postings.npy"
+IMPACTS_FILE = "bm25_impacts.npy"
+VOCAB_FILE = "bm25_vocab.json"
+DOCS_FILE = "bm25_docs.jsonl"
+META_FILE = "bm25_meta.json"
+
+# Identifiers such as `asset.get_by_guid`, `ATLAN-JAVA-404-000` or `/api/meta`
+# are kept whole and also split into their parts
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._:/-][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+
+def lexical_index_path(index_name: str) -> str:
+    return os.path.join(LEXICAL_DIR, index_name)
+
+
+def tokenize(text: str):
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART.findall(token))
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of a vector index, kept next to it on disk.
+
+    Postings are CSR arrays: `offsets[t]:offsets[t + 1]` slices the chunk
+    rows containing term t out of `postings`, and `impacts` holds each
+    posting's precomputed BM25 contribution, so a query is a handful of
+    slice-and-add operations over memory-mapped arrays. Chunk text and
+    metadata live in a JSONL sidecar. Writes (`add`/`delete`) are buffered
+    until `save()`, which rebuilds the postings.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._ids = []
+        self._docs = []
+        self._row = {}
+        self._vocab = {}
+        self._offsets = self._postings = self._impacts = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(os.path.join(path, META_FILE)):
+            self.load()
+
+    def __len__(self):
+        return len(self._ids)
+
+    @classmethod
+    def open(cls, index_name: str):
+        """The saved index for a vector index, or None if ingest has not built one."""
+        path = lexical_index_path(index_name)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            return None
+        return cls(path)
+
+    # Persistence
+
+    def load(self):
+        self._ids, self._docs = [], []
+        with open(os.path.join(self.path, DOCS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self._ids.append(record["id"])
+                self._docs.append({"text": record["text"], "metadata": record["metadata"]})
+        self._row = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        with open(os.path.join(self.path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            self._vocab = json.load(f)
+        self._offsets = np.load(os.path.join(self.path, OFFSETS_FILE), mmap_mode="r")
+        self._postings = np.load(os.path.join(self.path, POSTINGS_FILE), mmap_mode="r")
+        self._impacts = np.load(os.path.join(self.path, IMPACTS_FILE), mmap_mode="r")
+        self._dirty = False
+        logger.info(f"Loaded BM25 index of {len(self._ids)} chunks, {len(self._vocab)} terms from {self.path}")
+
+    def _build(self):
+        """Vocabulary and CSR postings arrays for the current documents."""
+        vocab = {}
+        terms, rows, tfs = [], [], []
+        doc_lengths = np.zeros(len(self._docs), dtype=np.float32)
+        for row, doc in enumerate(self._docs):
+            tokens = tokenize(doc["text"])
+            doc_lengths[row] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                terms.append(vocab.setdefault(term, len(vocab)))
+                rows.append(row)
+                tfs.append(tf)
+
+        terms = np.asarray(terms, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        postings = np.asarray(rows, dtype=np.int32)[order]
+        tfs = np.asarray(tfs, dtype=np.float32)[order]
+
+        doc_freq = np.bincount(terms, minlength=len(vocab))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=offsets[1:])
+
+        n = max(len(self._docs), 1)
+        idf = np.log1p((n - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths[postings] / max(avg_length, 1.0))
+        impacts = np.repeat(idf, doc_freq) * tfs * (self.k1 + 1) / (tfs + norm)
+        return vocab, offsets, postings, impacts.astype(np.float32)
+
+    def save(self):
+        """Rebuild the postings and write everything atomically."""
+        with self._lock:
+            if not self._dirty and os.path.exists(os.path.join(self.path, META_FILE)):
+                return
+            os.makedirs(self.path, exist_ok=True)
+            vocab, offsets, postings, impacts = self._build()
+
+            def write(name, writer):
+                tmp = os.path.join(self.path, name + ".tmp")
+                with open(tmp, "wb") as f:
+                    writer(f)
+                return tmp, os.path.join(self.path, name)
+
+            staged = [
+                write(OFFSETS_FILE, lambda f: np.save(f, offsets)),
+                write(POSTINGS_FILE, lambda f: np.save(f, postings)),
+                write(IMPACTS_FILE, lambda f: np.save(f, impacts)),
+                write(VOCAB_FILE, lambda f: f.write(json.dumps(vocab).encode("utf-8"))),
+                write(DOCS_FILE, lambda f: f.writelines(
+                    (json.dumps({"id": doc_id, **doc}, ensure_ascii=False) + "\n").encode("utf-8")
+                    for doc_id, doc in zip(self._ids, self._docs)
+                )),
+                write(META_FILE, lambda f: f.write(json.dumps(
+                    {"count": len(self._ids), "terms": len(vocab), "k1": self.k1, "b": self.b}
+                ).encode("utf-8"))),
+            ]
+            # Drop our memory maps before replacing the files underneath them
+            self._offsets = self._postings = self._impacts = None
+            for tmp, final in staged:
+                os.replace(tmp, final)
+
+        self.load()
+        logger.info(f"Saved BM25 index of {len(self._ids)} chunks to {self.path}")
+
+    # Writes
+
+    def add(self, ids, documents):
+        """Upsert chunks; searchable after the next save()."""
+        with self._lock:
+            for doc_id, doc in zip(ids, documents):
+                record = {"text": doc.page_content, "metadata": doc.metadata}
+                row = self._row.get(doc_id)
+                if row is None:
+                    self._row[doc_id] = len(self._ids)
+                    self._ids.append(doc_id)
+                    self._docs.append(record)
+                else:
+                    self._docs[row] = record
+            self._dirty = True
+
+    def update_metadata(self, doc_id: str, metadata: dict):
+        with self._lock:
+            row = self._row.get(doc_id)
+            if row is not None:
+                self._docs[row]["metadata"].update(metadata)
+                self._dirty = True
+
+    def delete(self, ids):
+        with self._lock:
+            drop = {self._row[i] for i in ids if i in self._row}
+            if not drop:
+                return
+            keep = [r for r in range(len(self._ids)) if r not in drop]
+            self._ids = [self._ids[r] for r in keep]
+            self._docs = [self._docs[r] for r in keep]
+            self._row = {doc_id: i for i, doc_id in enumerate(self._ids)}
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._ids, self._docs, self._row = [], [], {}
+            self._dirty = True
+
+    # Search
+
+    def top_k(self, query: str, k: int = 20):
+        """Top-k chunk rows and BM25 scores for a query (only rows matching some term)."""
+        if self._offsets is None or not self._ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            # Rows are unique within one posting list, so fancy-index += is safe
+            scores[self._postings[start:end]] += self._impacts[start:end]
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = np.argsort(-scores[matched])
+        return matched[order], scores[matched[order]]
+
+    def search(self, query: str, k: int = 20):
+        """[(Document, score)] of the best lexical matches, best first."""
+        rows, scores = self.top_k(query, k)
+        return [
+            (Document(id=self._ids[r], page_content=self._docs[r]["text"], metadata=self._docs[r]["metadata"]),
+             float(score))
+            for r, score in zip(rows, scores)
+        ]
+
+
+def document_key(doc: Document):
+    """Identity of a retrieved chunk across retrievers."""
+    return doc.id or (doc.metadata.get("source"), doc.page_content)
+
+
+def reciprocal_rank_fusion(result_lists, k: int = 60, limit: int = None):
+    """
+    Merge ranked Document lists by reciprocal-rank fusion: each document
+    scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    scores, docs = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:limit]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of the BM25 index on sampled chunk phrases")
+    parser.add_argument("--index", default="atlandb")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    index = BM25Index.open(args.index)
+    if index is None:
+        raise SystemExit("No BM25 index found; run ingest.py first")
+
+    rng = np.random.default_rng(0)
+    queries = []
+    for row in rng.integers(0, len(index), size=args.queries):
+        words = index._docs[row]["text"].split()
+        start = int(rng.integers(0, max(len(words) - 6, 1)))
+        queries.append(" ".join(words[start:start + 6]))
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.top_k(query, args.k)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{len(index)} chunks, {len(index._vocab)} terms, k={args.k}")
+    print(f"p50 {np.percentile(timings, 50):.3f} ms  p99 {np.percentile(timings, 99):.3f} ms")
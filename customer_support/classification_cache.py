@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "data", "cache", "classifications.sqlite")
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different copies share a key."""
+    return " ".join((text or "").lower().split())
+
+
+def prompt_version(template: str) -> str:
+    """Short fingerprint of a prompt template; editing the prompt invalidates old entries."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+class ClassificationCache:
+    """
+    On-disk (SQLite) cache of ticket classifications keyed on the normalized
+    ticket text, the prompt template version and the model name. Entries
+    expire after `ttl_seconds` and the least recently used ones are evicted
+    once the cache grows past `max_entries`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON classifications(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, version: str, model: str) -> str:
+        payload = "\x1f".join([normalize_text(text), version, model])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached classification dict, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM classifications WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE classifications SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classifications (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        if self.ttl_seconds:
+            cur = self._conn.execute(
+                "DELETE FROM classifications WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.evictions += cur.rowcount
+
+        count = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                "DELETE FROM classifications WHERE key IN "
+                "(SELECT key FROM classifications ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += cur.rowcount
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM classifications")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_classification_cache() -> ClassificationCache:
+    """Process-wide cache shared by the bulk classifier and the support agent."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ClassificationCache()
+        return _default_cache
@@ -1,93 +1,228 @@
 import json
+import time
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse, urljoin
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import os
+from http_cache import HTTPCache
+from page_corpus import PageCorpus
+from http_utils import HostPoliteness, build_session, looks_like_error
+from validate_urls import URLValidator
+
+def parse_lastmod(value):
+    """Sitemap <lastmod> (W3C datetime or plain date) as a Unix timestamp, or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
 
 
 class WebCrawler:
-    def __init__(self):
+    def __init__(self, max_workers: int = 16, per_host_concurrency: int = 4, per_host_delay: float = 0.1,
+                 max_depth: int = None, max_pages: int = None, timeout: int = 10,
+                 http_cache: HTTPCache = None, use_sitemaps: bool = True, corpus: PageCorpus = None):
+        # Every URL ever enqueued; checked at enqueue time so the frontier holds no duplicates
         self.visited = set()
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.session = build_session(pool_size=max_workers)
+        self.politeness = HostPoliteness(per_host_concurrency, per_host_delay)
+        self.http_cache = http_cache
+        self.use_sitemaps = use_sitemaps
+        # Raw pages are kept here so validation and ingest never re-download them
+        self.corpus = corpus
+        # url -> lastmod timestamp from the sites' sitemaps
+        self.lastmod = {}
+        self.stats = {"fetched": 0, "not_modified": 0, "sitemap_skipped": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
 
     def normalize_url(self, url):
         """Remove fragments and trailing slashes."""
         url = url.split('#')[0]
         return url.rstrip('/') if url.endswith('/') else url
 
-    def fetch_page(self, url):
-        """Try to fetch a page, return response or None if fails or invalid content."""
+    def extract_links(self, html, page_url):
+        """Normalized absolute URLs of all links on a page."""
+        # Parsing only <a> tags is much cheaper than building the full tree
+        soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("a", href=True))
+        return [self.normalize_url(urljoin(page_url, link["href"])) for link in soup.find_all("a", href=True)]
+
+    def fetch_sitemap(self, sitemap_url):
+        """Return {url: lastmod timestamp or None} from a sitemap, following sitemap indexes."""
+        entries = {}
         try:
-            resp = requests.get(url, timeout=10)
+            resp = self.session.get(sitemap_url, timeout=self.timeout)
+            resp.raise_for_status()
+            root = ET.fromstring(resp.content)
+        except (requests.exceptions.RequestException, ET.ParseError) as e:
+            print(f" No usable sitemap at {sitemap_url}: {e}")
+            return entries
+
+        ns = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+        if root.tag.endswith("sitemapindex"):
+            for loc in root.findall("sm:sitemap/sm:loc", ns):
+                entries.update(self.fetch_sitemap(loc.text.strip()))
+            return entries
+
+        for node in root.findall("sm:url", ns):
+            loc = node.find("sm:loc", ns)
+            if loc is None or not loc.text:
+                continue
+            lastmod = node.find("sm:lastmod", ns)
+            entries[self.normalize_url(loc.text.strip())] = parse_lastmod(lastmod.text if lastmod is not None else None)
+        return entries
+
+    def _visit(self, url):
+        """
+        Fetch a page (conditionally, when cached) and return its links, or
+        None if the page is invalid. Pages whose sitemap lastmod is older than
+        our cached copy are not requested at all.
+        """
+        entry = self.http_cache.get(url) if self.http_cache else None
+        if entry is not None and self.corpus and not self.corpus.has(url):
+            # Revalidating is pointless if we don't hold the body; download it in full
+            entry = None
+
+        if entry is not None:
+            lastmod = self.lastmod.get(url)
+            if lastmod is not None and lastmod <= entry["fetched_at"]:
+                self._count("sitemap_skipped")
+                return entry["links"] if entry["valid"] else None
+
+        host = urlparse(url).netloc
+        headers = self.http_cache.conditional_headers(entry) if self.http_cache else {}
+        self.politeness.acquire(host)
+        try:
+            resp = self.session.get(url, timeout=self.timeout, headers=headers)
+            if resp.status_code == 304 and entry is not None:
+                self._count("not_modified")
+                self.http_cache.touch(url)
+                return entry["links"] if entry["valid"] else None
             resp.raise_for_status()
-
-            if "text/html" not in resp.headers.get("Content-Type", ""):
-                return None
-
-            snippet = resp.text[:10000].lower()
-            error_signatures = [
-                "404 - not found",
-                "page not found",
-                "error 404",
-            ]
-
-            if any(sig in snippet for sig in error_signatures):
-                print(f" Skipping {url} (error-like content)")
-                return None
-
-            return resp.text
-
         except requests.exceptions.RequestException as e:
             print(f" Error fetching {url}: {e}")
-        return None
+            self._count("failed")
+            return None
+        finally:
+            self.politeness.release(host)
+
+        self._count("fetched")
+        if self.corpus:
+            self.corpus.put(url, resp.status_code, resp.headers, resp.content)
+        valid = "text/html" in resp.headers.get("Content-Type", "")
+        if valid and looks_like_error(resp.text):
+            print(f" Skipping {url} (error-like content)")
+            valid = False
+        links = self.extract_links(resp.text, url) if valid else []
+
+        if self.http_cache:
+            self.http_cache.store(url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), valid, links)
+        return links if valid else None
+
+    def _enqueue(self, url, depth, frontier):
+        if url in self.visited:
+            return
+        if self.max_pages is not None and len(self.visited) >= self.max_pages:
+            return
+        self.visited.add(url)
+        frontier.append((url, depth))
+
+    def crawl(self, base_urls):
+        """
+        Breadth-first crawl from several seeds at once, following links that
+        stay on the host of the page they were found on. With sitemaps
+        enabled, each host's sitemap.xml also seeds the frontier.
+        """
+        frontier = deque()
+        for base in base_urls:
+            self._enqueue(self.normalize_url(base), 0, frontier)
+
+        if self.use_sitemaps:
+            hosts = {urlparse(base).scheme + "://" + urlparse(base).netloc for base in base_urls}
+            for host in sorted(hosts):
+                entries = self.fetch_sitemap(f"{host}/sitemap.xml")
+                print(f" Sitemap for {host}: {len(entries)} URLs")
+                self.lastmod.update(entries)
+                for url in entries:
+                    self._enqueue(url, 1, frontier)
+
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.max_workers:
+                    url, depth = frontier.popleft()
+                    print("Visiting:", url)
+                    in_flight[pool.submit(self._visit, url)] = (url, depth)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = in_flight.pop(future)
+                    links = future.result()
+                    if not links:
+                        continue
+                    if self.max_depth is not None and depth >= self.max_depth:
+                        continue
+
+                    domain = urlparse(url).netloc
+                    for link in links:
+                        if urlparse(link).netloc == domain:
+                            self._enqueue(link, depth + 1, frontier)
 
     def crawl_pages(self, base_url):
         """Crawl pages within a single domain."""
-        start_url = self.normalize_url(base_url)
-        to_visit = [start_url]
-        domain = urlparse(start_url).netloc
-
-        while to_visit:
-            current_url = to_visit.pop()
-
-            if current_url in self.visited:
-                continue
-            self.visited.add(current_url)
-
-            print("Visiting:", current_url)
-            html = self.fetch_page(current_url)
-            if not html:
-                continue
-
-            soup = BeautifulSoup(html, "html.parser")
-            for link in soup.find_all("a", href=True):
-                href = link["href"]
-                full_url = urljoin(current_url, href)
-                normalized = self.normalize_url(full_url)
-
-                parsed = urlparse(normalized)
-                if parsed.netloc == domain and normalized not in self.visited:
-                    to_visit.append(normalized)
+        self.crawl([base_url])
 
     def crawl_multiple(self, base_urls):
         """Crawl multiple seeds."""
-        for base in base_urls:
-            print(f"\n--- Crawling from base: {base} ---")
-            self.crawl_pages(base)
+        print(f"\n--- Crawling from bases: {', '.join(base_urls)} ---")
+        self.crawl(base_urls)
         return list(self.visited)
 
     def validate_urls(self, urls):
         """Return only URLs that fetch successfully."""
-        valid_urls = []
-        for url in urls:
-            if self.fetch_page(url):
-                valid_urls.append(url)
-            else:
-                print(f"Removing dead URL: {url}")
-        return valid_urls
+        return URLValidator(max_workers=self.max_workers, session=self.session,
+                            politeness=self.politeness, corpus=self.corpus).validate_urls(urls)
 
 
 if __name__ == "__main__":
-    crawler = WebCrawler()
+    parser = argparse.ArgumentParser(description="Crawl the Atlan documentation sites")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--per-host", type=int, default=4, help="Concurrent requests per host")
+    parser.add_argument("--delay", type=float, default=0.1, help="Seconds between request starts per host")
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the HTTP revalidation cache")
+    parser.add_argument("--no-sitemaps", action="store_true", help="Discover URLs from links only")
+    parser.add_argument("--no-corpus", action="store_true", help="Don't store fetched pages in the local corpus")
+    args = parser.parse_args()
+
+    crawler = WebCrawler(
+        max_workers=args.workers,
+        per_host_concurrency=args.per_host,
+        per_host_delay=args.delay,
+        max_depth=args.max_depth,
+        max_pages=args.max_pages,
+        http_cache=None if args.no_cache else HTTPCache(),
+        use_sitemaps=not args.no_sitemaps,
+        corpus=None if args.no_corpus else PageCorpus(),
+    )
 
 
     seed_urls = [
@@ -98,9 +233,11 @@ if __name__ == "__main__":
     ]
 
     print("\n=== Starting crawl ===")
+    start = time.perf_counter()
     all_urls = crawler.crawl_multiple(seed_urls)
 
-    print(f"\nTotal collected URLs (before validation): {len(all_urls)}")
+    print(f"\nTotal collected URLs (before validation): {len(all_urls)} in {time.perf_counter() - start:.1f}s")
+    print(f"Fetch stats: {crawler.stats}")
 
 
 
@@ -2,25 +2,48 @@ import logging
 import os
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
-from langchain_openai import ChatOpenAI
-from rag_builder import RAGAgent
+from resources import get_chat_model, get_rag_agent
+from classification_cache import ClassificationCache, get_classification_cache, prompt_version
+from fast_classifier import HEADS, get_fast_path
 from state import State
-from prompt import classifier_prompt
-from schema import AnswerWithSources, TicketClassificationModel
+from prompt import classification_prompt, classifier_prompt, classify_and_answer_prompt
+from schema import AnswerWithSources, TicketClassificationModel, TicketAnswerModel
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Same version as the bulk classifier (classification_prompt + classifier_prompt), so both share entries
+CLASSIFIER_PROMPT_VERSION = prompt_version(classification_prompt + classifier_prompt)
+# "speculative" retrieves while the ticket is being classified; "sequential" only after routing;
+# "single_pass" retrieves first and classifies and answers in one LLM call
+GRAPH_MODES = ("speculative", "sequential", "single_pass")
+
 
 class CustomerSupportAgent:
-    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.7):
+    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.7, index_name: str = "atlandb",
+                 graph_mode: str = "speculative"):
         load_dotenv()
         os.environ['OPENAI_API_KEY'] = os.getenv('Openai_api_key')
+        if graph_mode not in GRAPH_MODES:
+            raise ValueError(f"Unknown graph mode `{graph_mode}`; expected one of {GRAPH_MODES}")
 
         self.model_name = model
         self.temperature = temperature
-        self.llm = ChatOpenAI(temperature=temperature, model_name=model)
+        self.index_name = index_name
+        self.graph_mode = graph_mode
+        self.llm = get_chat_model(model, temperature)
+        # Built once and reused for every ticket. Classification runs at temperature 0
+        # so the result written to the shared cache is the one a rerun would give.
+        self.classifier_llm = get_chat_model(model, 0).with_structured_output(TicketClassificationModel)
+        self.classify_answer_llm = self.llm.with_structured_output(TicketAnswerModel)
+        self.classification_cache = get_classification_cache()
+        # Local model that answers confident cases without an LLM call (None when disabled)
+        self.fast_path = get_fast_path()
+
+        # The agent is long-lived: compile the graph (and warm the RAG
+        # resources behind it) once instead of on every run_graph call.
+        self.graph = self.build_graph()
 
     def TicketClassifier(self, state: State):
         """Classify a structured ticket into topic, sentiment, and priority."""
@@ -28,23 +51,45 @@ class CustomerSupportAgent:
         if not question.strip():
             return {"error": "No question provided"}
 
+        cache_key = ClassificationCache.make_key(question, CLASSIFIER_PROMPT_VERSION, self.model_name)
+        cached = self.classification_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Ticket classification (cached): {cached}")
+            return self._ticket_fields(question, cached)
+
+        if self.fast_path is not None:
+            labels = self.fast_path.classify(question)
+            if labels is not None:
+                logger.info(f"Ticket classification (local): {labels}")
+                return self._ticket_fields(question, labels)
+
         ticket_classification = classifier_prompt.format(question=question)
         logger.info(f"Formatted classification prompt: {ticket_classification}")
 
-        structured_llm = self.llm.with_structured_output(TicketClassificationModel)
-        result = structured_llm.invoke(ticket_classification)
+        result = self.classifier_llm.invoke(ticket_classification)
 
         logger.info(f"Ticket classification: {result}")
 
-        return {
+        classification = {
             "subject": result.subject,
             "body": result.body,
             "topic_tags": result.topic_tags,
             "sentiment": result.sentiment,
             "priority": result.priority,
         }
+        # Labels only: entries are shared with the bulk classifier, which has its own subject/body
+        self.classification_cache.put(cache_key, {h: classification[h] for h in HEADS})
+        if self.fast_path is not None:
+            self.fast_path.record_llm(question, classification)
+        return classification
 
  
+    @staticmethod
+    def _ticket_fields(question: str, labels: dict):
+        """State for a ticket classified without the LLM: its first line as subject, the text as body."""
+        subject = question.strip().splitlines()[0][:80]
+        return {"subject": subject, "body": question, **labels}
+
     def router(self, state: State):
         """
         Determine the routing based on the topic_tag list.
@@ -73,6 +118,58 @@ class CustomerSupportAgent:
         return "AssignTeam"
 
    
+    def prefetch(self, state: State):
+        """Embed the question and retrieve candidates while TicketClassifier runs."""
+        question = state.get("question", "")
+        if not question.strip():
+            return {}
+        try:
+            question_embedding = state.get("question_embedding") or self.rag_agent.embedder.embed_query(question)
+            context = self.rag_agent.search(question, question_embedding)
+        except Exception as e:
+            # Speculation is best effort; the rag subgraph retrieves again if needed
+            logger.warning(f"Speculative retrieval failed: {e}")
+            return {}
+        return {"question_embedding": question_embedding, "context": context}
+
+    def ClassifyAndAnswer(self, state: State):
+        """Single-pass mode: retrieve, then classify and answer with one structured-output call."""
+        question = state.get("question", "")
+        if not question.strip():
+            return {"error": "No question provided"}
+
+        question_embedding = state.get("question_embedding") or self.rag_agent.embedder.embed_query(question)
+        candidates = self.rag_agent.search(question, question_embedding)
+        context, sources, docs_content = self.rag_agent.assemble_context(question, candidates)
+
+        prompt = classify_and_answer_prompt.format(question=question, context=docs_content, source=sources)
+        result = self.classify_answer_llm.invoke(prompt)
+        logger.info(f"Ticket classification (single pass): {result.topic_tags}, {result.sentiment}, {result.priority}")
+
+        classification = {
+            "subject": result.subject,
+            "body": result.body,
+            "topic_tags": result.topic_tags,
+            "sentiment": result.sentiment,
+            "priority": result.priority,
+        }
+        # Same training log as the two-step classifier; not cached, since this call
+        # runs at the answer temperature rather than the classifier's temperature 0
+        if self.fast_path is not None:
+            self.fast_path.record_llm(question, classification)
+
+        return {
+            **classification,
+            "question_embedding": question_embedding,
+            "context": context,
+            "answer": AnswerWithSources(answer=result.answer, sources=result.sources),
+            "sources": result.sources,
+        }
+
+    def join(self, state: State):
+        """Waits for classification and prefetch; routing happens on its way out."""
+        return {}
+
     def AssignTeam(self, state: State):
         logger.info("No suitable subgraph found for the given topic tags.")
         topics = state.get("topic_tags", [])
@@ -83,27 +180,57 @@ class CustomerSupportAgent:
         )
         return {
             "answer": result,
-            "sources": []
+            "sources": [],
+            # Drop anything retrieved speculatively
+            "context": [],
         }
 
     def build_graph(self):
         parent = StateGraph(State)
 
 
-        rag = RAGAgent("atlandb").build()
+        self.rag_agent = get_rag_agent(self.index_name, self.model_name)
+        rag = self.rag_agent.graph
+
+        if self.graph_mode == "single_pass":
+            parent.add_node("ClassifyAndAnswer", self.ClassifyAndAnswer)
+            parent.add_node("AssignTeam", self.AssignTeam)
+            parent.add_edge(START, "ClassifyAndAnswer")
+            # The answer is already there for rag topics; other tickets go to a team as before
+            parent.add_conditional_edges(
+                "ClassifyAndAnswer",
+                self.router,
+                {
+                    "rag": END,
+                    "AssignTeam": "AssignTeam",
+                    "last_node": "AssignTeam",
+                }
+            )
+            parent.add_edge("AssignTeam", END)
+            return parent.compile()
 
         parent.add_node("TicketClassifier", self.TicketClassifier)
         parent.add_node("rag", rag)
         parent.add_node("AssignTeam", self.AssignTeam)
 
         parent.add_edge(START, "TicketClassifier")
+        route_from = "TicketClassifier"
+        if self.graph_mode == "speculative":
+            # Retrieval only needs the question, so it overlaps the classifier call
+            parent.add_node("prefetch", self.prefetch)
+            parent.add_node("join", self.join)
+            parent.add_edge(START, "prefetch")
+            parent.add_edge(["TicketClassifier", "prefetch"], "join")
+            route_from = "join"
 
         parent.add_conditional_edges(
-            "TicketClassifier",
+            route_from,
             self.router,
             {
                 "rag": "rag",
                 "AssignTeam": "AssignTeam",
+                # No topics (or a failed classification) goes to a team, as in single_pass
+                "last_node": "AssignTeam",
             }
         )
 
@@ -113,6 +240,20 @@ class CustomerSupportAgent:
 
         return parent.compile()
 
+    def metrics(self):
+        """Cache, fast-path classifier and context-size statistics for the dashboard."""
+        metrics = {
+            "classification_cache": self.classification_cache.stats(),
+            "embedding_cache": self.rag_agent.embedder.stats(),
+        }
+        if self.rag_agent.answer_cache is not None:
+            metrics["answer_cache"] = self.rag_agent.answer_cache.metrics()
+        if self.fast_path is not None:
+            metrics["fast_classifier"] = self.fast_path.metrics()
+        if self.rag_agent.context_builder is not None:
+            metrics["context"] = self.rag_agent.context_builder.metrics()
+        return metrics
+
     def run_graph(self, question: str):
         """
         Main function to be called externally.
@@ -124,9 +265,106 @@ class CustomerSupportAgent:
             dict: Complete state with all results
         """
         try:
-            graph = self.build_graph()
-            result = graph.invoke({"question": question})
+            result = self.graph.invoke({"question": question})
             return result
         except Exception as e:
             logger.error(f"Graph execution error: {e}")
             return {"error": str(e)}
+
+    def _batch_inputs(self, questions, embeddings):
+        if embeddings is None:
+            return [{"question": q} for q in questions]
+        return [{"question": q, "question_embedding": e} for q, e in zip(questions, embeddings)]
+
+    def _embed_questions(self, questions):
+        """One embedding call for the whole batch; nodes reuse state["question_embedding"]."""
+        try:
+            return self.rag_agent.embedder.embed_documents(questions)
+        except Exception as e:
+            # Not fatal: each ticket embeds its own question inside the graph instead
+            logger.warning(f"Batch embedding failed, embedding per ticket: {e}")
+            return None
+
+    async def _aembed_questions(self, questions):
+        try:
+            return await self.rag_agent.embedder.aembed_documents(questions)
+        except Exception as e:
+            logger.warning(f"Batch embedding failed, embedding per ticket: {e}")
+            return None
+
+    @staticmethod
+    def _isolate(result):
+        """A failed ticket becomes an {"error": ...} result instead of failing the batch."""
+        if isinstance(result, Exception):
+            logger.error(f"Graph execution error: {result}")
+            return {"error": str(result)}
+        return result
+
+    def run_graph_batch(self, questions, max_concurrency: int = 8):
+        """
+        Run many tickets through the compiled graph, at most `max_concurrency`
+        at a time. Questions are embedded in one call up front. Returns one
+        result per question, in input order; failures are {"error": ...}.
+        """
+        questions = list(questions)
+        inputs = self._batch_inputs(questions, self._embed_questions(questions))
+        results = self.graph.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        return [self._isolate(result) for result in results]
+
+    def iter_graph_batch(self, questions, max_concurrency: int = 8):
+        """Like run_graph_batch, but yields (index, result) pairs as tickets finish."""
+        questions = list(questions)
+        inputs = self._batch_inputs(questions, self._embed_questions(questions))
+        for index, result in self.graph.batch_as_completed(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            yield index, self._isolate(result)
+
+    async def arun_graph_batch(self, questions, max_concurrency: int = 8):
+        """Async run_graph_batch."""
+        questions = list(questions)
+        inputs = self._batch_inputs(questions, await self._aembed_questions(questions))
+        results = await self.graph.abatch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        return [self._isolate(result) for result in results]
+
+    async def aiter_graph_batch(self, questions, max_concurrency: int = 8):
+        """Async iter_graph_batch: yields (index, result) pairs as tickets finish."""
+        questions = list(questions)
+        inputs = self._batch_inputs(questions, await self._aembed_questions(questions))
+        async for index, result in self.graph.abatch_as_completed(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            yield index, self._isolate(result)
+
+    def stream_graph(self, question: str):
+        """
+        Run the graph and yield events as they happen, for incremental UIs:
+
+            ("classification", dict)  as soon as TicketClassifier finishes
+            ("token", str)            answer text as the model generates it
+            ("result", dict)          the final state, as run_graph returns it
+
+        Errors are yielded as ("result", {"error": ...}).
+        """
+        result = {"question": question}
+        config = {"configurable": {"stream_answer": True}}
+        try:
+            for namespace, mode, chunk in self.graph.stream(
+                {"question": question}, config=config, stream_mode=["updates", "messages"], subgraphs=True
+            ):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") == "generate" and message.content:
+                        yield "token", message.content
+                    continue
+                # Subgraph updates are repeated in the parent's `rag` update
+                if namespace:
+                    continue
+                for node, update in chunk.items():
+                    result.update(update or {})
+                    if node in ("TicketClassifier", "ClassifyAndAnswer"):
+                        yield "classification", dict(update or {})
+        except Exception as e:
+            logger.error(f"Graph execution error: {e}")
+            result = {"error": str(e)}
+        yield "result", result
@@ -53,7 +53,8 @@ def process_evaluation_set(agent, input_df):
 
 if __name__ == "__main__":
 
-    rag_pipeline = RAGAgent(index_name=PINECONE_INDEX_NAME)
+    # Evaluation needs the retrieved contexts, so bypass the semantic answer cache
+    rag_pipeline = RAGAgent(index_name=PINECONE_INDEX_NAME, answer_cache_threshold=None)
     rag_agent = rag_pipeline.build()
     logger.info("RAG Agent and graph built successfully.")
     try:
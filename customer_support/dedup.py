@@ -0,0 +1,117 @@
+import re
+import zlib
+import threading
+from collections import defaultdict
+import numpy as np
+
+# Mersenne prime modulus below 2**32. Shingle hashes are reduced mod p first,
+# so with a, b, x < p every a * x + b is below 2**63 and the multiply-mod is
+# exact in uint64 while a and b still range over the whole field
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 5) -> np.ndarray:
+    """32-bit hashes of the distinct word `size`-grams of a text."""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def jaccard(text: str, other: str) -> float:
+    """Exact Jaccard similarity of two texts' shingle sets."""
+    a, b = set(shingles(text).tolist()), set(shingles(other).tolist())
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures with LSH banding: texts whose estimated Jaccard
+    similarity over word shingles is at least `threshold` are treated as
+    near-duplicates of the first one seen. With 16 bands of 8 rows a pair
+    becomes a candidate at roughly 0.7 similarity; candidates are then
+    checked against the threshold on the full signature. Thread-safe.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 16, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._buckets = defaultdict(list)
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text) % _PRIME
+        # (num_perm, n_shingles) permuted hashes; the minimum per row is the signature
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def similarity(self, text: str, other: str) -> float:
+        """Estimated Jaccard similarity of two texts' shingle sets."""
+        return float(np.mean(self.signature(text) == self.signature(other)))
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, key, text: str):
+        """
+        Index `text` under `key` and return None, or, if it nearly duplicates
+        an earlier text, return that text's key without indexing this one.
+        """
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            seen = set()
+            for band_key in band_keys:
+                for other in self._buckets.get(band_key, ()):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    if np.mean(self._signatures[other] == signature) >= self.threshold:
+                        return other
+            self._signatures[key] = signature
+            for band_key in band_keys:
+                self._buckets[band_key].append(key)
+        return None
+
+
+def _fixture_pairs(words: int = 300, seed: int = 0):
+    """(text, variant) pairs with a share of words replaced, spanning Jaccard ~0.3-0.95."""
+    rng = np.random.default_rng(seed)
+    vocab = [f"term{i}" for i in range(5000)]
+    base = [str(w) for w in rng.choice(vocab, size=words)]
+    pairs = []
+    for replaced in (0.01, 0.03, 0.05, 0.08, 0.12, 0.2):
+        variant = list(base)
+        for i in rng.choice(words, size=int(words * replaced), replace=False):
+            variant[i] = str(rng.choice(vocab))
+        pairs.append((" ".join(base), " ".join(variant)))
+    return pairs
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check MinHash estimates against exact Jaccard on fixture pairs")
+    parser.add_argument("--seeds", type=int, default=20, help="Independent hash families to average over")
+    parser.add_argument("--tolerance", type=float, default=0.03, help="Allowed |mean estimate - exact|")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'exact':>8}{'estimate':>10}{'error':>8}")
+    for text, variant in _fixture_pairs():
+        exact = jaccard(text, variant)
+        estimate = float(np.mean([NearDuplicateIndex(seed=s).similarity(text, variant) for s in range(args.seeds)]))
+        bad = abs(estimate - exact) > args.tolerance
+        failed |= bad
+        print(f"{exact:>8.3f}{estimate:>10.3f}{estimate - exact:>+8.3f}{'  FAIL' if bad else ''}")
+    sys.exit(1 if failed else 0)
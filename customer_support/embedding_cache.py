@@ -0,0 +1,165 @@
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "data", "cache", "embeddings.sqlite")
+DEFAULT_MAX_ENTRIES = 500_000
+# Hot query vectors kept in process memory in front of SQLite
+MEMORY_ENTRIES = 2048
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed cache around an Embeddings instance (e.g. OpenAIEmbeddings).
+    Vectors are keyed on a hash of model + text and stored as float32 blobs in
+    SQLite, with least-recently-used eviction past `max_entries`. Only texts
+    that miss the cache are sent to the wrapped model.
+    """
+
+    def __init__(self, embedder: Embeddings, model: str, path: str = DEFAULT_CACHE_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.embedder = embedder
+        self.model = model
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_emb_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        """Return {key: vector} for every key found on disk, refreshing last_used."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in items],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def _split(self, texts):
+        """Resolve cached vectors; return (vectors with None for misses, keys, miss indices)."""
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(keys)
+        vectors = [found.get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return vectors, keys, missing
+
+    def _fill(self, vectors, keys, missing, embedded):
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+        if missing:
+            self._store([(keys[i], vectors[i]) for i in missing])
+        return vectors
+
+    def embed_documents(self, texts):
+        vectors, keys, missing = self._split(texts)
+        embedded = self.embedder.embed_documents([texts[i] for i in missing]) if missing else []
+        return self._fill(vectors, keys, missing, embedded)
+
+    async def aembed_documents(self, texts):
+        vectors, keys, missing = self._split(texts)
+        embedded = await self.embedder.aembed_documents([texts[i] for i in missing]) if missing else []
+        return self._fill(vectors, keys, missing, embedded)
+
+    def _memory_get(self, text):
+        with self._lock:
+            vector = self._memory.get(text)
+            if vector is not None:
+                self._memory.move_to_end(text)
+            return vector
+
+    def _memory_put(self, text, vector):
+        with self._lock:
+            self._memory[text] = vector
+            self._memory.move_to_end(text)
+            if len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def embed_query(self, text):
+        vector = self._memory_get(text)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        vectors, keys, missing = self._split([text])
+        if missing:
+            self._fill(vectors, keys, missing, [self.embedder.embed_query(text)])
+        self._memory_put(text, vectors[0])
+        return vectors[0]
+
+    async def aembed_query(self, text):
+        vector = self._memory_get(text)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        vectors, keys, missing = self._split([text])
+        if missing:
+            self._fill(vectors, keys, missing, [await self.embedder.aembed_query(text)])
+        self._memory_put(text, vectors[0])
+        return vectors[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
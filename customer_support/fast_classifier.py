@@ -0,0 +1,318 @@
+import os
+import re
+import json
+import math
+import random
+import logging
+import argparse
+import threading
+from collections import Counter
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, "data", "models", "fast_classifier.npz")
+# Every ticket the LLM labels is appended here and used as training data
+DEFAULT_LABEL_LOG = os.path.join(BASE_DIR, "data", "labels", "llm_labels.jsonl")
+SEED_TICKETS = os.path.join(BASE_DIR, "..", "classifier", "sample_ticket_c.json")
+
+DEFAULT_THRESHOLD = float(os.getenv("FAST_CLASSIFIER_THRESHOLD", "0.8"))
+# Share of confident predictions still sent to the LLM to measure agreement
+DEFAULT_AUDIT_RATE = float(os.getenv("FAST_CLASSIFIER_AUDIT_RATE", "0.05"))
+MAX_FEATURES = 5000
+HEADS = ("topic_tags", "sentiment", "priority")
+# Set on records labelled by this model, so they are never trained on again
+CLASSIFIED_BY_FAST_PATH = {"classified_by": "fast_path"}
+
+_WORD = re.compile(r"\w+")
+
+
+def ticket_text(subject: str, body: str) -> str:
+    return f"{subject or ''}\n{body or ''}".strip()
+
+
+def _terms(text: str):
+    words = _WORD.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _sigmoid(logits):
+    return 1.0 / (1.0 + np.exp(-logits))
+
+
+def _fit(X, Y, multi_label: bool, epochs: int = 300, lr: float = 1.0, l2: float = 1e-3):
+    """Logistic regression by full-batch gradient descent: softmax, or one-vs-rest sigmoids."""
+    n = X.shape[0]
+    W = np.zeros((X.shape[1], Y.shape[1]), dtype=np.float32)
+    b = np.zeros(Y.shape[1], dtype=np.float32)
+    for _ in range(epochs):
+        logits = X @ W + b
+        P = _sigmoid(logits) if multi_label else _softmax(logits)
+        G = (P - Y) / n
+        W -= lr * (X.T @ G + l2 * W)
+        b -= lr * G.sum(axis=0)
+    return W, b
+
+
+class FastClassifier:
+    """
+    CPU-only ticket classifier: sublinear TF-IDF over word unigrams and
+    bigrams feeding three logistic-regression heads (multi-label topic tags,
+    sentiment, priority). Prediction is a sparse lookup plus three small
+    matrix products, well under a millisecond per ticket.
+    """
+
+    def __init__(self, vocab, idf, heads):
+        self.vocab = vocab
+        self.idf = idf
+        # head -> (classes, W, b)
+        self.heads = heads
+
+    def _vectorize(self, text: str):
+        counts = Counter(t for t in _terms(text) if t in self.vocab)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        index = np.fromiter((self.vocab[t] for t in counts), dtype=np.int64, count=len(counts))
+        values = np.fromiter((1.0 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+        values *= self.idf[index]
+        return index, values / max(float(np.linalg.norm(values)), 1e-12)
+
+    @classmethod
+    def train(cls, examples):
+        """Fit on [(text, {"topic_tags": [...], "sentiment": ..., "priority": ...})]."""
+        docs = [Counter(_terms(text)) for text, _ in examples]
+        df = Counter(term for counts in docs for term in counts)
+        terms = [term for term, _ in df.most_common(MAX_FEATURES)]
+        vocab = {term: i for i, term in enumerate(terms)}
+        n = len(examples)
+        idf = np.array([math.log((1 + n) / (1 + df[t])) + 1.0 for t in terms], dtype=np.float32)
+
+        model = cls(vocab, idf, {})
+        X = np.zeros((n, len(vocab)), dtype=np.float32)
+        for row, (text, _) in enumerate(examples):
+            index, values = model._vectorize(text)
+            X[row, index] = values
+
+        for head in HEADS:
+            multi_label = head == "topic_tags"
+            labels = [label[head] if multi_label else [label[head]] for _, label in examples]
+            classes = sorted({c for row in labels for c in row})
+            Y = np.zeros((n, len(classes)), dtype=np.float32)
+            for row, values in enumerate(labels):
+                for c in values:
+                    Y[row, classes.index(c)] = 1.0
+            W, b = _fit(X, Y, multi_label)
+            model.heads[head] = (classes, W, b)
+        return model
+
+    def predict(self, text: str):
+        """Return (labels dict, confidence in [0, 1]); confidence is the weakest head's."""
+        index, values = self._vectorize(text)
+        labels, confidences = {}, []
+        for head, (classes, W, b) in self.heads.items():
+            logits = values @ W[index] + b
+            if head == "topic_tags":
+                probs = _sigmoid(logits)
+                chosen = [c for c, p in zip(classes, probs) if p >= 0.5] or [classes[int(np.argmax(probs))]]
+                labels[head] = chosen
+                # Every tag decision has to be confident, in or out
+                confidences.append(float(np.min(np.maximum(probs, 1.0 - probs))))
+            else:
+                probs = _softmax(logits)
+                best = int(np.argmax(probs))
+                labels[head] = classes[best]
+                confidences.append(float(probs[best]))
+        return labels, min(confidences)
+
+    def save(self, path: str = DEFAULT_MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {"terms": np.array(sorted(self.vocab, key=self.vocab.get)), "idf": self.idf}
+        for head, (classes, W, b) in self.heads.items():
+            arrays[f"{head}_classes"] = np.array(classes)
+            arrays[f"{head}_W"] = W
+            arrays[f"{head}_b"] = b
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH):
+        with np.load(path) as data:
+            vocab = {str(term): i for i, term in enumerate(data["terms"])}
+            heads = {
+                head: ([str(c) for c in data[f"{head}_classes"]], data[f"{head}_W"], data[f"{head}_b"])
+                for head in HEADS
+            }
+            return cls(vocab, data["idf"], heads)
+
+
+def _llm_labelled(record) -> bool:
+    """Whether a classified ticket carries labels from the LLM (not a failure or a fast-path guess)."""
+    return (
+        "error" not in record
+        and all(h in record for h in HEADS)
+        and record.get("classified_by") != CLASSIFIED_BY_FAST_PATH["classified_by"]
+    )
+
+
+def load_examples(seed_path: str = SEED_TICKETS, label_log: str = DEFAULT_LABEL_LOG):
+    """
+    Training pairs from the LLM-labelled sample tickets plus every LLM label
+    logged since. Failed tickets and the model's own predictions are skipped.
+    """
+    examples = {}
+    if os.path.exists(seed_path):
+        with open(seed_path, "r", encoding="utf-8") as f:
+            for ticket in json.load(f):
+                if _llm_labelled(ticket):
+                    examples[ticket_text(ticket["subject"], ticket["body"])] = {h: ticket[h] for h in HEADS}
+    if os.path.exists(label_log):
+        with open(label_log, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "text" not in record or not _llm_labelled(record.get("labels", {})):
+                    continue
+                # Later labels for the same text win
+                examples[record["text"]] = record["labels"]
+    return list(examples.items())
+
+
+class FastPath:
+    """
+    Gate in front of the LLM classifier: `classify` returns the local
+    prediction when it is at least `threshold` confident (else None, meaning
+    "ask the LLM"), and `record_llm` logs the LLM's labels as training data
+    and scores agreement with what the local model would have said. A small
+    `audit_rate` of confident tickets is also sent to the LLM so agreement is
+    measured on accepted predictions, not only rejected ones.
+    """
+
+    def __init__(self, model: FastClassifier, threshold: float = DEFAULT_THRESHOLD,
+                 audit_rate: float = DEFAULT_AUDIT_RATE, label_log: str = DEFAULT_LABEL_LOG):
+        self.model = model
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.label_log = label_log
+        self.accepted = 0
+        self.fallbacks = 0
+        self.compared = 0
+        self.agreed = Counter()
+        self._lock = threading.Lock()
+
+    def classify(self, text: str):
+        labels, confidence = self.model.predict(text)
+        accept = confidence >= self.threshold and random.random() >= self.audit_rate
+        with self._lock:
+            if accept:
+                self.accepted += 1
+            else:
+                self.fallbacks += 1
+        return labels if accept else None
+
+    def record_llm(self, text: str, labels: dict):
+        labels = {h: labels[h] for h in HEADS}
+        predicted, _ = self.model.predict(text)
+        with self._lock:
+            self.compared += 1
+            matches = [
+                set(predicted[h]) == set(labels[h]) if h == "topic_tags" else predicted[h] == labels[h]
+                for h in HEADS
+            ]
+            for head, match in zip(HEADS, matches):
+                self.agreed[head] += match
+            self.agreed["all"] += all(matches)
+
+            os.makedirs(os.path.dirname(self.label_log), exist_ok=True)
+            with open(self.label_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"text": text, "labels": labels}, ensure_ascii=False) + "\n")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self.accepted + self.fallbacks
+            return {
+                "predictions": total,
+                "fast_path_rate": self.accepted / total if total else 0.0,
+                "llm_fallbacks": self.fallbacks,
+                "compared_with_llm": self.compared,
+                "agreement": {
+                    key: self.agreed[key] / self.compared if self.compared else 0.0
+                    for key in (*HEADS, "all")
+                },
+            }
+
+
+_default_fast_path = None
+_default_lock = threading.Lock()
+
+
+def get_fast_path():
+    """
+    Process-wide fast path shared by the support agent and the bulk
+    classifier, or None when disabled (FAST_CLASSIFIER=0) or untrainable.
+    A missing model is trained from the available labels on first use.
+    """
+    global _default_fast_path
+    if os.getenv("FAST_CLASSIFIER", "1") == "0":
+        return None
+    with _default_lock:
+        if _default_fast_path is None:
+            if os.path.exists(DEFAULT_MODEL_PATH):
+                model = FastClassifier.load()
+            else:
+                examples = load_examples()
+                if not examples:
+                    return None
+                try:
+                    model = FastClassifier.train(examples)
+                    model.save()
+                except Exception as e:
+                    # The fast path is optional; never let it stop the agent from starting
+                    logger.warning(f"Could not train the fast-path classifier: {e}")
+                    return None
+            _default_fast_path = FastPath(model)
+        return _default_fast_path
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Train the local fast-path ticket classifier")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of examples held out for evaluation")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    examples = load_examples()
+    random.Random(0).shuffle(examples)
+    split = int(len(examples) * (1 - args.holdout))
+    train, test = examples[:split], examples[split:]
+    print(f"{len(examples)} labelled tickets ({len(train)} train / {len(test)} held out)")
+
+    if test:
+        model = FastClassifier.train(train)
+        accepted = correct = 0
+        started = time.perf_counter()
+        for text, labels in test:
+            predicted, confidence = model.predict(text)
+            if confidence >= args.threshold:
+                accepted += 1
+                correct += all(
+                    set(predicted[h]) == set(labels[h]) if h == "topic_tags" else predicted[h] == labels[h]
+                    for h in HEADS
+                )
+        per_ticket_ms = (time.perf_counter() - started) * 1000 / len(test)
+        print(f"Held out: {accepted}/{len(test)} above threshold {args.threshold}, "
+              f"{correct}/{accepted or 1} of those fully correct, {per_ticket_ms:.3f} ms/ticket")
+
+    model = FastClassifier.train(examples)
+    model.save()
+    print(f"Saved model trained on all {len(examples)} tickets to {DEFAULT_MODEL_PATH}")
@@ -0,0 +1,181 @@
+import re
+import json
+import bisect
+import argparse
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+
+try:
+    import lxml  # noqa: F401
+
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# Main content region of the docs sites, most specific first
+# (docs.atlan.com is Docusaurus, developer.atlan.com is MkDocs Material)
+MAIN_SELECTORS = (".theme-doc-markdown", ".md-content__inner", ".md-content", "article", "main", "[role=main]")
+# Site chrome repeated on every page
+DROP_TAGS = ("nav", "footer", "aside", "script", "style", "noscript", "svg", "form", "button", "iframe")
+# Site header when no main region was found; inside one (Docusaurus wraps the page H1 in a
+# <header> within .theme-doc-markdown) a <header> belongs to the content and is kept
+PAGE_CHROME_TAGS = ("header",)
+DROP_SELECTORS = (
+    ".theme-doc-toc-mobile", ".theme-doc-footer", ".pagination-nav", ".theme-edit-this-page", ".breadcrumbs",
+    ".md-sidebar", ".md-source-file", ".md-content__button", ".hash-link", ".headerlink",
+)
+HEADINGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+BLOCK_TAGS = ("p", "div", "section", "li", "tr", "table", "ul", "ol", "dl", "dt", "dd", "blockquote", "br")
+
+_BLANK_LINES = re.compile(r"\n\s*\n\s*\n+")
+_TRAILING_SPACE = re.compile(r"[ \t]+\n")
+
+
+def _heading_anchor(tag):
+    """Fragment id a heading can be linked to, if any."""
+    if tag.get("id"):
+        return tag["id"]
+    link = tag.find("a", href=re.compile(r"^#"))
+    return link["href"][1:] if link else ""
+
+
+def extract(html: str):
+    """
+    Main-content text of a docs page, with site chrome removed. Headings are
+    kept as markdown `#` lines and code blocks as fenced blocks. Returns
+    (text, metadata, sections) where sections is a list of
+    (offset in text, anchor, heading) in document order.
+    """
+    soup = BeautifulSoup(html, PARSER)
+    metadata = {}
+    if soup.title and soup.title.string:
+        metadata["title"] = soup.title.get_text().strip()
+    description = soup.find("meta", attrs={"name": "description"})
+    if description and description.get("content"):
+        metadata["description"] = description["content"]
+    html_tag = soup.find("html")
+    if html_tag and html_tag.get("lang"):
+        metadata["language"] = html_tag["lang"]
+
+    region = None
+    for selector in MAIN_SELECTORS:
+        region = soup.select_one(selector)
+        if region is not None:
+            break
+    drop_tags = DROP_TAGS
+    if region is None:
+        region = soup.body or soup
+        drop_tags += PAGE_CHROME_TAGS
+
+    dropped = region.find_all(drop_tags) + [tag for selector in DROP_SELECTORS for tag in region.select(selector)]
+    for tag in dropped:
+        # Nested matches are already gone with their parent
+        if not tag.decomposed:
+            tag.decompose()
+
+    for pre in region.find_all("pre"):
+        # Docusaurus renders code lines as spans separated by <br>
+        for br in pre.find_all("br"):
+            br.replace_with("\n")
+        code = pre.get_text().strip("\n")
+        pre.replace_with(f"\n\n```\n{code}\n```\n\n")
+
+    headings = []
+    for tag in region.find_all(HEADINGS):
+        title = " ".join(tag.get_text(" ").split())
+        if not title:
+            tag.decompose()
+            continue
+        headings.append((_heading_anchor(tag), title))
+        tag.replace_with(f"\n\n{'#' * int(tag.name[1])} {title}\n\n")
+
+    for tag in region.find_all(BLOCK_TAGS):
+        tag.insert_after("\n")
+
+    text = region.get_text()
+    text = _TRAILING_SPACE.sub("\n", text)
+    text = _BLANK_LINES.sub("\n\n", text).strip()
+
+    # Locate each heading line in the final text, in order
+    sections, position = [], 0
+    for anchor, title in headings:
+        found = re.compile(rf"^#+ {re.escape(title)}$", re.M).search(text, position)
+        if found:
+            sections.append((found.start(), anchor, title))
+            position = found.end()
+    if "title" not in metadata and sections:
+        metadata["title"] = sections[0][2]
+    return text, metadata, sections
+
+
+def extract_document(page) -> Document:
+    """Turn a stored page into a Document holding only its main content."""
+    text, metadata, sections = extract(page["html"])
+    metadata["source"] = page["url"]
+    metadata["sections"] = sections
+    return Document(page_content=text, metadata=metadata)
+
+
+def section_at(sections, offset: int):
+    """(anchor, heading) of the section containing `offset`, or None before the first heading."""
+    i = bisect.bisect_right([start for start, _, _ in sections], offset) - 1
+    return (sections[i][1], sections[i][2]) if i >= 0 else None
+
+
+def split_document(doc: Document, splitter):
+    """
+    Split an extracted document into chunks, tagging each with the heading
+    and `#anchor` of the section it starts in. Requires a splitter created
+    with add_start_index=True.
+    """
+    sections = doc.metadata.get("sections", [])
+    base = Document(
+        page_content=doc.page_content,
+        metadata={key: value for key, value in doc.metadata.items() if key != "sections"},
+    )
+    chunks = splitter.split_documents([base])
+    for chunk in chunks:
+        section = section_at(sections, chunk.metadata.get("start_index", 0))
+        if section:
+            anchor, heading = section
+            chunk.metadata["section"] = heading
+            if anchor:
+                chunk.metadata["anchor"] = anchor
+    return chunks
+
+
+if __name__ == "__main__":
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from page_corpus import PageCorpus, page_to_document
+    from token_count import count_tokens
+
+    parser = argparse.ArgumentParser(description="Chunk and token counts before/after boilerplate stripping")
+    parser.add_argument("--urls", default="data/valid_urls.json")
+    parser.add_argument("--limit", type=int, default=None, help="Only measure the first N pages")
+    args = parser.parse_args()
+
+    with open(args.urls) as f:
+        urls = json.load(f)[:args.limit]
+
+    corpus = PageCorpus()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+    totals = {"before": [0, 0], "after": [0, 0]}
+    pages = 0
+    for url in urls:
+        page = corpus.get(url)
+        if page is None or page["status"] != 200:
+            continue
+        pages += 1
+        for label, doc in (("before", page_to_document(page)), ("after", extract_document(page))):
+            chunks = split_document(doc, splitter) if label == "after" else splitter.split_documents([doc])
+            totals[label][0] += len(chunks)
+            totals[label][1] += sum(count_tokens(chunk.page_content) for chunk in chunks)
+
+    print(f"{pages} pages from the corpus (parser: {PARSER})")
+    print(f"{'':<8}{'chunks':>10}{'tokens':>12}")
+    for label, (chunks, tokens) in totals.items():
+        print(f"{label:<8}{chunks:>10}{tokens:>12}")
+    before_chunks, before_tokens = totals["before"]
+    if before_chunks:
+        after_chunks, after_tokens = totals["after"]
+        print(f"{'saved':<8}{1 - after_chunks / before_chunks:>10.1%}{1 - after_tokens / max(before_tokens, 1):>12.1%}")
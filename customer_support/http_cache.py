@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from email.utils import formatdate
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "data", "cache", "http_cache.sqlite")
+
+
+class HTTPCache:
+    """
+    Persistent per-URL HTTP validators (ETag / Last-Modified) plus the links
+    and validity found on the page the last time it was downloaded. Lets the
+    crawler send conditional GETs and still follow the links of pages that
+    come back 304 Not Modified.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                valid INTEGER NOT NULL,
+                links TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, url: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, valid, links, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "valid": bool(row[2]),
+            "links": json.loads(row[3]),
+            "fetched_at": row[4],
+        }
+
+    def conditional_headers(self, entry) -> dict:
+        """If-None-Match / If-Modified-Since headers for a cached entry."""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        elif entry["fetched_at"]:
+            headers["If-Modified-Since"] = formatdate(entry["fetched_at"], usegmt=True)
+        return headers
+
+    def store(self, url: str, etag: str, last_modified: str, valid: bool, links):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, valid, links, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, int(valid), json.dumps(links), time.time()),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """Record that a cached page was confirmed unchanged just now."""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
@@ -0,0 +1,62 @@
+import time
+import threading
+from collections import defaultdict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Only this much of a page is inspected for error-like content
+SNIPPET_BYTES = 10000
+
+ERROR_SIGNATURES = [
+    "404 - not found",
+    "page not found",
+    "error 404",
+]
+
+
+def build_session(pool_size: int = 16, retries: int = 2):
+    """requests.Session with a connection pool sized for `pool_size` concurrent requests."""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET"],
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "AtlanSupportCrawler/1.0"
+    return session
+
+
+class HostPoliteness:
+    """Per-host concurrency cap and minimum delay between request starts."""
+
+    def __init__(self, max_concurrency: int = 4, delay: float = 0.1):
+        self.delay = delay
+        self._slots = defaultdict(lambda: threading.Semaphore(max_concurrency))
+        self._next_start = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str):
+        with self._lock:
+            slot = self._slots[host]
+        slot.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start[host])
+            self._next_start[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host: str):
+        self._slots[host].release()
+
+
+def looks_like_error(html: str) -> bool:
+    """True if the start of a page looks like a soft 404."""
+    snippet = html[:SNIPPET_BYTES].lower()
+    return any(sig in snippet for sig in ERROR_SIGNATURES)
+
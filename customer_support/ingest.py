@@ -1,25 +1,50 @@
 import json
 import os
 import logging
+import argparse
+import threading
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
+from resources import get_embedder, get_pinecone_client
+from vector_store import (
+    resolve_backend,
+    open_vector_store,
+    delete_vectors,
+    update_metadata,
+    fetch_documents,
+    clear_vector_store,
+    count_vectors,
+    finalize_vector_store,
+    upsert_vectors,
+)
+from local_vector_store import LocalVectorStore
+from answer_cache import mark_index_updated
+from ingest_manifest import IngestManifest, content_hash, chunk_id
+from page_corpus import PageCorpus
+from html_extract import extract_document, split_document
+from http_utils import build_session
+from ingest_pipeline import Pipeline, Stage, log_stage_stats
+from dedup import NearDuplicateIndex
+from bm25_index import BM25Index, lexical_index_path
+from rate_limiter import RateLimiter, retry
+from token_count import count_tokens
 import streamlit as st
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# OpenAI accepts at most this many inputs per embedding request
+MAX_EMBED_INPUTS = 2048
+
 # Load environment variables
 load_dotenv()
 os.environ["OPENAI_API_KEY"] = os.getenv("Openai_api_key")
 
-def build_vector_db(url_file: str, index_name: str):
-    """Build a vector database from a list of URLs into Pinecone."""
+def ensure_pinecone_index(index_name: str):
+    """Create the Pinecone index if it does not exist yet."""
     # Init Pinecone client
 
-    pc = Pinecone(api_key=os.getenv("pinecone_api_key"))
+    pc = get_pinecone_client()
     # pc = Pinecone(api_key=st.secrets["pinecone_api_key"])
     
     # env = st.secrets["PINECONE_ENV"]
@@ -36,35 +61,318 @@ def build_vector_db(url_file: str, index_name: str):
         )
         logger.info(f"📦 Created Pinecone index `{index_name}` in {env}")
 
+
+def _item_url(item):
+    """Source URL of an item at any pipeline stage (url, page, Document, or chunk tuple)."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        return item["url"]
+    if isinstance(item, tuple):
+        item = item[1]
+    return item.metadata["source"]
+
+
+def build_vector_db(url_file: str, index_name: str, backend: str = None, full: bool = False,
+                    load_workers: int = 8, embed_workers: int = 4, embed_token_budget: int = 20_000,
+                    embed_rpm: int = 3000, embed_tpm: int = 1_000_000, upsert_workers: int = 4,
+                    upsert_batch_size: int = 100, max_retries: int = 5, queue_size: int = 256,
+                    dedup_threshold: float = 0.85):
+    """
+    Incrementally sync a vector database (Pinecone or the local backend) with
+    a list of URLs. A manifest of per-URL content hashes and chunk ids lets
+    unchanged pages be skipped, changed pages be re-chunked and re-embedded,
+    and chunks of changed or removed pages be deleted. Chunk ids are
+    deterministic, so upserts are idempotent. `full` rebuilds from scratch,
+    as does a run against an index that has vectors but no manifest.
+
+    Pages stream through load -> clean -> split -> dedup -> pack -> embed ->
+    upsert stages connected by bounded queues, so memory stays flat and
+    embedding starts while pages are still loading. Chunks that nearly
+    duplicate one already seen in this run (MinHash similarity of at least
+    `dedup_threshold`; None disables it) are dropped, and the surviving
+    chunk lists every page it stands for in its `sources` metadata. Unchanged
+    pages deduplicated against a chunk that is being deleted are re-processed
+    in the same run. Chunks are packed into embedding
+    requests of up to `embed_token_budget` tokens, `embed_workers` requests
+    run concurrently within the `embed_rpm`/`embed_tpm` quota, and upserts
+    go out in parallel batches. Rate-limit and server errors are retried per
+    request/batch, so only the failed ones are sent again.
+    """
+    backend = resolve_backend(backend)
+    if backend == "pinecone":
+        ensure_pinecone_index(index_name)
+
     # Load URLs
     with open(url_file) as f:
         urls = json.load(f)
 
+    # Use the smaller embedding model, behind the shared embedding cache so
+    # unchanged chunks are not re-embedded on repeat ingests
+    embeddings = get_embedder("text-embedding-3-small")
+    vectordb = open_vector_store(index_name, embeddings, backend, create=True)
+    manifest = IngestManifest(index_name)
+    # BM25 index over the same chunks, for hybrid retrieval
+    lexical = BM25Index(lexical_index_path(index_name))
+
+    if not full and not manifest.pages and count_vectors(vectordb):
+        # Vectors written without a manifest (e.g. by the pre-manifest ingest, under
+        # random ids) would never be deleted and would duplicate every page
+        logger.warning(" Index has vectors but no ingest manifest; forcing a full rebuild")
+        full = True
+
+    if full:
+        logger.info(" Full rebuild: clearing index and manifest ...")
+        clear_vector_store(vectordb)
+        lexical.clear()
+        manifest.clear()
+    elif not len(lexical) and manifest.pages:
+        # Index built before the lexical side existed; seed it with what is already stored
+        existing_ids = [i for url in manifest.pages for i in manifest.chunk_ids(url)]
+        logger.info(f" Seeding BM25 index with {len(existing_ids)} existing chunks ...")
+        documents = fetch_documents(vectordb, existing_ids)
+        lexical.add([doc.id for doc in documents], documents)
+
+    # Pages that are no longer in the URL list
+    stale_ids = []
+    removed_urls = set(manifest.pages) - set(urls)
+    for url in removed_urls:
+        stale_ids.extend(manifest.remove(url))
+
+    # Pages come from the local corpus written by the crawler; only missing
+    # pages are downloaded (and then kept for the next run)
     logger.info(f" Loading {len(urls)} URLs from {url_file} ...")
-    loader = WebBaseLoader(urls)
-    docs = loader.load()
-
-    # Split documents
-    logger.info(f" Splitting documents into chunks ...")
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_documents(docs)
-    logger.info(f" Generated {len(chunks)} chunks from {len(docs)} documents.")
-    logger.info(f" Loading embeddings...")
-    # Use the smaller embedding model
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-
-    # Push to Pinecone
-    vectordb = PineconeVectorStore.from_documents(
-        chunks,
-        embeddings,
-        index_name=index_name
+    corpus = PageCorpus()
+    session = build_session(pool_size=load_workers)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+
+    lock = threading.Lock()
+    # url -> (page hash, chunk ids); applied to the manifest after each pipeline pass
+    pending = {}
+    failed_urls = set()
+    unchanged = set()
+    # Pages re-processed even though unchanged, because chunks they were deduplicated against are going away
+    requeued = set()
+    limiter = RateLimiter(requests_per_minute=embed_rpm, tokens_per_minute=embed_tpm)
+    # Chunks waiting to fill the next embedding request, and their token total
+    packing = {"chunks": [], "tokens": 0}
+    near_duplicates = NearDuplicateIndex(threshold=dedup_threshold) if dedup_threshold else None
+    # dropped chunk id -> (surviving chunk id, its URL); survivor id -> URLs it stands for
+    dropped = {}
+    survivor_sources = {}
+
+    def load(url):
+        page = corpus.fetch(url, session=session)
+        if page is None or page["status"] != 200:
+            logger.warning(f"Skipping {url}: not available")
+            return []
+        return [page]
+
+    def clean(page):
+        # Main content only: nav, sidebars and footers repeat on every page
+        doc = extract_document(page)
+        if page["url"] not in requeued and manifest.is_unchanged(page["url"], content_hash(doc.page_content)):
+            with lock:
+                unchanged.add(page["url"])
+            return []
+        return [doc]
+
+    def split(doc):
+        url = doc.metadata["source"]
+        page_chunks = split_document(doc, splitter)
+        page_ids = [chunk_id(url, i, chunk.page_content) for i, chunk in enumerate(page_chunks)]
+        with lock:
+            pending[url] = (content_hash(doc.page_content), page_ids)
+        return list(zip(page_ids, page_chunks))
+
+    def dedup(item):
+        doc_id, chunk = item
+        url = chunk.metadata["source"]
+        survivor = near_duplicates.add((doc_id, url), chunk.page_content)
+        if survivor is None:
+            return [item]
+        survivor_id, survivor_url = survivor
+        with lock:
+            dropped[doc_id] = survivor
+            survivor_sources.setdefault(survivor_id, {survivor_url}).add(url)
+        return []
+
+    def pack(item):
+        doc_id, chunk = item
+        tokens = count_tokens(chunk.page_content)
+        ready = []
+        if packing["chunks"] and (packing["tokens"] + tokens > embed_token_budget
+                                  or len(packing["chunks"]) >= MAX_EMBED_INPUTS):
+            ready.append(packing["chunks"])
+            packing["chunks"], packing["tokens"] = [], 0
+        packing["chunks"].append((doc_id, chunk, tokens))
+        packing["tokens"] += tokens
+        return ready
+
+    def flush_pack():
+        # The pipeline may run again (re-processed pages), so leave the packer empty
+        ready = [packing["chunks"]] if packing["chunks"] else []
+        packing["chunks"], packing["tokens"] = [], 0
+        return ready
+
+    def embed(request):
+        texts = [chunk.page_content for _, chunk, _ in request]
+        tokens = sum(n for _, _, n in request)
+
+        def call():
+            # Charged in full even when the embedding cache answers part of
+            # the request, which only errs on the side of staying under quota
+            limiter.acquire(tokens)
+            return embeddings.embed_documents(texts)
+
+        vectors = retry(call, max_retries=max_retries)
+        return [(doc_id, chunk, vector) for (doc_id, chunk, _), vector in zip(request, vectors)]
+
+    def upsert(batch):
+        retry(
+            lambda: upsert_vectors(
+                vectordb,
+                [doc_id for doc_id, _, _ in batch],
+                [vector for _, _, vector in batch],
+                [chunk for _, chunk, _ in batch],
+            ),
+            max_retries=max_retries,
+        )
+        lexical.add([doc_id for doc_id, _, _ in batch], [chunk for _, chunk, _ in batch])
+        return batch
+
+    def on_error(stage, item, exc):
+        items = item if isinstance(item, list) else [item]
+        with lock:
+            failed_urls.update(_item_url(i) for i in items)
+
+    def run_pipeline(source):
+        pipeline = Pipeline(
+            [
+                Stage("load", load, workers=load_workers),
+                Stage("clean", clean, workers=2),
+                Stage("split", split),
+                *([Stage("dedup", dedup, workers=2)] if near_duplicates else []),
+                # Packing keeps state between items, so it runs on a single thread
+                Stage("pack", pack, flush=flush_pack),
+                Stage("embed", embed, workers=embed_workers),
+                # The local store is an in-memory matrix; it takes writes from one thread
+                Stage("upsert", upsert, batch_size=upsert_batch_size,
+                      workers=1 if isinstance(vectordb, LocalVectorStore) else upsert_workers),
+            ],
+            queue_size=queue_size,
+            on_error=on_error,
+        )
+        log_stage_stats(pipeline.run(source))
+
+    written = 0
+    applied = set()
+    source = urls
+    while source:
+        run_pipeline(source)
+        new = {url: entry for url, entry in pending.items() if url not in applied}
+        applied.update(new)
+
+        # A page whose duplicate chunks point at a failed page's chunk is incomplete too
+        for url, (_, page_ids) in new.items():
+            if any(dropped[i][1] in failed_urls for i in page_ids if i in dropped):
+                failed_urls.add(url)
+
+        for url, (page_hash, page_ids) in new.items():
+            old_ids = manifest.chunk_ids(url)
+            if url in failed_urls:
+                # Some chunks may have been written; keep every id so the next run
+                # (forced by the empty hash) can clean up whichever are stale
+                manifest.update(url, "", set(old_ids) | set(page_ids))
+                continue
+            kept_ids = [i for i in page_ids if i not in dropped]
+            stale_ids.extend(set(old_ids) - set(kept_ids))
+            manifest.update(url, page_hash, kept_ids, duplicate_of=[dropped[i][0] for i in page_ids if i in dropped])
+            written += len(kept_ids)
+
+        # Pages deduplicated against chunks that are about to be deleted would
+        # lose that content; run them through the pipeline again before the
+        # deletes go out (each page at most once)
+        source = [url for url in manifest.dependents(stale_ids) if url not in requeued]
+        if source:
+            logger.info(f" Re-processing {len(source)} pages whose near-duplicate chunks are being deleted ...")
+            requeued.update(source)
+            unchanged.difference_update(source)
+
+    # Dependents that could not be re-processed (e.g. their page failed to load) are retried next run
+    for url in manifest.dependents(stale_ids):
+        manifest.invalidate(url)
+
+    logger.info(
+        f" {len(pending)} new/changed pages ({written} chunks), {len(unchanged)} unchanged, "
+        f"{len(requeued)} re-processed for deleted near-duplicates, "
+        f"{len(removed_urls)} removed, {len(failed_urls)} failed, {len(stale_ids)} stale chunks, "
+        f"{len(dropped)} near-duplicate chunks dropped"
     )
 
-    logger.info(f"✅ Stored {len(chunks)} chunks in Pinecone index `{index_name}`")
+    # Survivors were upserted before their duplicates turned up
+    sources = {
+        doc_id: {"sources": sorted(urls)}
+        for doc_id, urls in survivor_sources.items()
+        if not urls & failed_urls
+    }
+    if sources:
+        retry(lambda: update_metadata(vectordb, sources), max_retries=max_retries)
+        for doc_id, metadata in sources.items():
+            lexical.update_metadata(doc_id, metadata)
+
+    # Stale chunks are deleted only after their replacements were upserted
+    if stale_ids:
+        delete_vectors(vectordb, stale_ids)
+        lexical.delete(stale_ids)
+    finalize_vector_store(vectordb)
+    lexical.save()
+    # Only record progress once the index reflects it
+    manifest.save()
+
+    logger.info(f"✅ Synced {written} chunks into {backend} index `{index_name}`")
+    logger.info(f"Embedding cache: {embeddings.stats()}")
+
+    if pending or stale_ids:
+        # Cached answers were built from the previous index contents
+        mark_index_updated(index_name)
 
 
 if __name__ == "__main__":
     
 
+    parser = argparse.ArgumentParser(description="Build or incrementally refresh the Atlan vector DB")
+    parser.add_argument("--urls", default="data/valid_urls.json")
+    parser.add_argument("--index", default="atlandb")
+    parser.add_argument("--backend", default=None, help="pinecone or local (default: VECTOR_BACKEND)")
+    parser.add_argument("--full", action="store_true", help="Clear the index and rebuild everything")
+    parser.add_argument("--load-workers", type=int, default=8)
+    parser.add_argument("--embed-workers", type=int, default=4, help="Concurrent embedding requests")
+    parser.add_argument("--embed-tokens", type=int, default=20_000, help="Token budget per embedding request")
+    parser.add_argument("--embed-rpm", type=int, default=3000, help="Embedding requests per minute")
+    parser.add_argument("--embed-tpm", type=int, default=1_000_000, help="Embedding tokens per minute")
+    parser.add_argument("--upsert-workers", type=int, default=4)
+    parser.add_argument("--upsert-batch", type=int, default=100, help="Vectors per upsert request")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries per failed request/batch")
+    parser.add_argument("--dedup-threshold", type=float, default=0.85,
+                        help="MinHash similarity above which chunks count as near-duplicates (0 disables)")
+    parser.add_argument("--queue-size", type=int, default=256, help="Bound on items buffered between stages")
+    args = parser.parse_args()
+
     logger.info("Building Atlan Vector DB...")
-    build_vector_db("data/valid_urls.json", "atlandb")
+    build_vector_db(
+        args.urls,
+        args.index,
+        backend=args.backend,
+        full=args.full,
+        load_workers=args.load_workers,
+        embed_workers=args.embed_workers,
+        embed_token_budget=args.embed_tokens,
+        embed_rpm=args.embed_rpm,
+        embed_tpm=args.embed_tpm,
+        upsert_workers=args.upsert_workers,
+        upsert_batch_size=args.upsert_batch,
+        max_retries=args.max_retries,
+        dedup_threshold=args.dedup_threshold,
+        queue_size=args.queue_size,
+    )
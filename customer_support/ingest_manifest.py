@@ -0,0 +1,66 @@
+import os
+import json
+import hashlib
+
+MANIFEST_DIR = os.path.join(os.path.dirname(__file__), "data", "manifests")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(url: str, position: int, text: str) -> str:
+    """Deterministic vector id: re-ingesting the same chunk upserts instead of duplicating."""
+    return hashlib.sha256(f"{url}\x1f{position}\x1f{text}".encode("utf-8")).hexdigest()[:32]
+
+
+class IngestManifest:
+    """
+    Per-index record of what is currently in the vector store: for every URL
+    the hash of the page content it was built from and the ids of its chunks.
+    """
+
+    def __init__(self, index_name: str, path: str = None):
+        self.path = path or os.path.join(MANIFEST_DIR, f"{index_name}.json")
+        self.pages = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.pages = json.load(f).get("pages", {})
+
+    def is_unchanged(self, url: str, page_hash: str) -> bool:
+        entry = self.pages.get(url)
+        return entry is not None and entry["hash"] == page_hash
+
+    def chunk_ids(self, url: str):
+        return self.pages.get(url, {}).get("chunk_ids", [])
+
+    def update(self, url: str, page_hash: str, chunk_ids, duplicate_of=()):
+        entry = {"hash": page_hash, "chunk_ids": list(chunk_ids)}
+        if duplicate_of:
+            # Chunks of other pages standing in for this page's near-duplicates
+            entry["duplicate_of"] = sorted(set(duplicate_of))
+        self.pages[url] = entry
+
+    def dependents(self, chunk_ids):
+        """Pages whose deduplicated content relies on any of the given chunks."""
+        chunk_ids = set(chunk_ids)
+        return [url for url, entry in self.pages.items() if chunk_ids & set(entry.get("duplicate_of", ()))]
+
+    def invalidate(self, url: str):
+        """Force a page to be re-processed on the next run."""
+        if url in self.pages:
+            self.pages[url]["hash"] = ""
+
+    def remove(self, url: str):
+        """Forget a page and return the ids of the chunks it contributed."""
+        return self.pages.pop(url, {}).get("chunk_ids", [])
+
+    def clear(self):
+        self.pages = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pages": self.pages}, f)
+        os.replace(tmp, self.path)
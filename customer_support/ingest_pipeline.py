@@ -0,0 +1,159 @@
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline. `fn` receives a single item (or a list of up to
+    `batch_size` items when batch_size > 1) and returns an iterable of output
+    items for the next stage. `workers` threads run it concurrently. A
+    stateful stage can pass `flush`, called once after its input is
+    exhausted, to emit whatever it is still holding.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, batch_size: int = 1, batch_wait: float = 0.2,
+                 flush=None):
+        self.name = name
+        self.fn = fn
+        self.flush = flush
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+
+        self.items_in = 0
+        self.items_out = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.first_at = None
+        self.last_at = None
+        self._lock = threading.Lock()
+        self._finished_workers = 0
+
+    def stats(self) -> dict:
+        wall = (self.last_at - self.first_at) if self.first_at and self.last_at else 0.0
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "in": self.items_in,
+            "out": self.items_out,
+            "failures": self.failures,
+            "items_per_s": self.items_in / wall if wall else 0.0,
+            "busy_s": round(self.busy_seconds, 2),
+        }
+
+
+class Pipeline:
+    """
+    Runs stages as overlapping thread pools connected by bounded queues, so
+    memory stays flat and later stages (e.g. embedding) start while earlier
+    ones (e.g. loading) are still producing. A failing item is logged,
+    counted, and reported to `on_error(stage_name, item, exc)`; the rest of
+    the run continues.
+    """
+
+    def __init__(self, stages, queue_size: int = 64, on_error=None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.on_error = on_error
+
+    def _take(self, stage, inbox):
+        """Next item or batch from `inbox`; None once the input is exhausted."""
+        item = inbox.get()
+        if item is _DONE:
+            inbox.put(_DONE)  # let sibling workers see it too
+            return None
+        if stage.batch_size == 1:
+            return item
+
+        batch = [item]
+        deadline = time.monotonic() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            try:
+                item = inbox.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                inbox.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self, stage, inbox, outbox):
+        while True:
+            item = self._take(stage, inbox)
+            if item is None:
+                break
+
+            count = len(item) if stage.batch_size > 1 else 1
+            start = time.perf_counter()
+            with stage._lock:
+                stage.items_in += count
+                if stage.first_at is None:
+                    stage.first_at = start
+            try:
+                outputs = list(stage.fn(item) or [])
+            except Exception as e:
+                logger.error(f"Stage `{stage.name}` failed: {e}")
+                with stage._lock:
+                    stage.failures += count
+                if self.on_error:
+                    self.on_error(stage.name, item, e)
+                outputs = []
+
+            with stage._lock:
+                stage.items_out += len(outputs)
+                stage.busy_seconds += time.perf_counter() - start
+                stage.last_at = time.perf_counter()
+            if outbox is not None:
+                for output in outputs:
+                    outbox.put(output)
+
+        # The last worker of a stage flushes it and closes the next stage's input
+        with stage._lock:
+            stage._finished_workers += 1
+            last = stage._finished_workers == stage.workers
+        if not last:
+            return
+        outputs = list(stage.flush() or []) if stage.flush else []
+        with stage._lock:
+            stage.items_out += len(outputs)
+        if outbox is not None:
+            for output in outputs:
+                outbox.put(output)
+            outbox.put(_DONE)
+
+    def run(self, source):
+        """Feed `source` through all stages and block until everything has drained."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(stage, queues[i], outbox), name=f"{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        for item in source:
+            queues[0].put(item)
+        queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        return [stage.stats() for stage in self.stages]
+
+
+def log_stage_stats(stats):
+    for row in stats:
+        logger.info(
+            f" {row['stage']:<8} workers={row['workers']:<3} in={row['in']:<6} out={row['out']:<6} "
+            f"failures={row['failures']:<4} {row['items_per_s']:.1f} items/s (busy {row['busy_s']}s)"
+        )
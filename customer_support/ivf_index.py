@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import logging
+import argparse
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+OFFSETS_FILE = "ivf_offsets.npy"
+ROWS_FILE = "ivf_rows.npy"
+META_FILE = "ivf_meta.json"
+IVF_FILES = (CENTROIDS_FILE, OFFSETS_FILE, ROWS_FILE, META_FILE)
+
+DEFAULT_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+# Rows scored per step when assigning vectors to centroids
+_ASSIGN_BATCH = 8192
+
+
+def _assign(vectors, centroids):
+    """Index of the most similar centroid for every row, computed in batches."""
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _ASSIGN_BATCH):
+        block = np.asarray(vectors[start:start + _ASSIGN_BATCH], dtype=np.float32)
+        labels[start:start + _ASSIGN_BATCH] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(vectors, n_clusters: int, iterations: int = 20, sample_size: int = 50_000, seed: int = 0):
+    """k-means on unit vectors (cosine), trained on a random sample of rows."""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample_rows = rng.choice(n, size=min(n, sample_size), replace=False)
+    sample = np.asarray(vectors[np.sort(sample_rows)], dtype=np.float32)
+
+    centroids = sample[rng.choice(sample.shape[0], size=n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        # Per-cluster sums via one sort + reduceat instead of a Python loop
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = np.flatnonzero(counts)
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+
+        # Re-seed empty clusters from random sample points
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = sample[rng.choice(sample.shape[0], size=empty.size, replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over a unit-normalized
+    vector matrix. Rows are bucketed by their nearest k-means centroid; a
+    query scores only the rows in its `nprobe` closest buckets.
+
+    Inverted lists are stored flat: `rows[offsets[c]:offsets[c + 1]]` are the
+    matrix rows assigned to centroid c.
+    """
+
+    def __init__(self, centroids, offsets, rows, count: int, nprobe: int = DEFAULT_NPROBE):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.count = count
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, vectors, n_lists: int = None, iterations: int = 20, nprobe: int = DEFAULT_NPROBE):
+        n = vectors.shape[0]
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+
+        start = time.perf_counter()
+        centroids = spherical_kmeans(vectors, n_lists, iterations=iterations)
+        labels = _assign(vectors, centroids)
+        rows = np.argsort(labels, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))]).astype(np.int64)
+        logger.info(f"Built IVF index with {n_lists} lists over {n} vectors in {time.perf_counter() - start:.1f}s")
+        return cls(centroids, offsets, rows, n, nprobe=nprobe)
+
+    def search(self, vectors, query, k: int = 4, nprobe: int = None):
+        """Approximate top-k rows and scores of `vectors` for a unit-normalized query."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(self.n_lists)
+
+        candidates = np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in probes])
+        if candidates.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Sorted row order keeps memory-mapped reads mostly sequential
+        candidates.sort()
+        scores = vectors[candidates] @ query
+        k = min(k, scores.shape[0])
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top])]
+        return candidates[top].astype(np.int64), scores[top]
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(path, ROWS_FILE), self.rows)
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"count": self.count, "n_lists": self.n_lists}, f)
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = DEFAULT_NPROBE):
+        """Memory-map a saved index; returns None if there is none at `path`."""
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            np.load(os.path.join(path, CENTROIDS_FILE)),
+            np.load(os.path.join(path, OFFSETS_FILE)),
+            np.load(os.path.join(path, ROWS_FILE), mmap_mode="r"),
+            meta["count"],
+            nprobe=nprobe,
+        )
+
+    @staticmethod
+    def remove(path: str):
+        for name in IVF_FILES:
+            file_path = os.path.join(path, name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def exact_search(vectors, query, k: int):
+    scores = vectors @ query
+    k = min(k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def recall_report(vectors, index: IVFIndex, queries=None, k: int = 10, nprobes=(1, 2, 4, 8, 16, 32),
+                  n_queries: int = 200, seed: int = 0):
+    """
+    Recall@k and median latency of the IVF index against exact search for
+    several nprobe values. Without explicit queries, perturbed copies of
+    random stored vectors are used.
+    """
+    rng = np.random.default_rng(seed)
+    if queries is None:
+        rows = rng.choice(vectors.shape[0], size=min(n_queries, vectors.shape[0]), replace=False)
+        queries = np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+        queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact, exact_ms = [], []
+    for q in queries:
+        start = time.perf_counter()
+        exact.append(set(exact_search(vectors, q, k).tolist()))
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+    report = [{"method": "exact", "nprobe": None, "recall": 1.0, "p50_ms": float(np.median(exact_ms))}]
+    for nprobe in nprobes:
+        if nprobe > index.n_lists:
+            break
+        hits, latencies = 0, []
+        for q, truth in zip(queries, exact):
+            start = time.perf_counter()
+            rows, _ = index.search(vectors, q, k, nprobe=nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(truth.intersection(rows.tolist()))
+        report.append({
+            "method": "ivf",
+            "nprobe": nprobe,
+            "recall": hits / (len(queries) * k),
+            "p50_ms": float(np.median(latencies)),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    from local_vector_store import LocalVectorStore
+    from vector_store import local_store_path
+
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of the IVF index against exact search")
+    parser.add_argument("--index", default="atlandb")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    store = LocalVectorStore(None, path=local_store_path(args.index))
+    if store.ann is None:
+        raise SystemExit("No IVF index found; run ingest.py with VECTOR_BACKEND=local first")
+
+    print(f"{len(store)} vectors, {store.ann.n_lists} lists, k={args.k}")
+    print(f"{'method':<8}{'nprobe':>8}{'recall@k':>10}{'p50 ms':>10}")
+    for row in recall_report(store.vectors, store.ann, k=args.k, n_queries=args.queries):
+        nprobe = "-" if row["nprobe"] is None else row["nprobe"]
+        print(f"{row['method']:<8}{nprobe:>8}{row['recall']:>10.3f}{row['p50_ms']:>10.3f}")
@@ -0,0 +1,271 @@
+import os
+import json
+import uuid
+import logging
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from ivf_index import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+DOCS_FILE = "docs.jsonl"
+META_FILE = "meta.json"
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store for offline use and low-latency retrieval.
+
+    Unit-normalized vectors live in a float32 matrix that is memory-mapped
+    from `<path>/vectors.f32`; chunk text and metadata live in a JSONL
+    sidecar. Search is exact cosine similarity (one matrix-vector product
+    followed by argpartition for the top-k) unless an IVF index has been
+    built, in which case only the `nprobe` closest inverted lists are scored.
+    """
+
+    def __init__(self, embedding, path: str = None):
+        self._embedding = embedding
+        self.path = path
+        self._ids = []
+        self._docs = []
+        self._row = {}
+        self._vectors = None
+        self._pending = []
+        self.ann = None
+        if path and os.path.exists(os.path.join(path, META_FILE)):
+            self.load()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def vectors(self):
+        self._consolidate()
+        return self._vectors
+
+    # Persistence
+
+    def load(self):
+        with open(os.path.join(self.path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self._ids, self._docs = [], []
+        with open(os.path.join(self.path, DOCS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self._ids.append(record["id"])
+                self._docs.append({"text": record["text"], "metadata": record["metadata"]})
+        self._row = {doc_id: i for i, doc_id in enumerate(self._ids)}
+
+        if meta["count"]:
+            self._vectors = np.memmap(
+                os.path.join(self.path, VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(meta["count"], meta["dim"]),
+            )
+        else:
+            self._vectors = None
+
+        self.ann = IVFIndex.load(self.path)
+        if self.ann is not None and self.ann.count != meta["count"]:
+            logger.warning(f"IVF index at {self.path} is stale; falling back to exact search")
+            self.ann = None
+        logger.info(f"Loaded {meta['count']} vectors from {self.path}")
+
+    def persist(self, path: str = None):
+        """Write vectors, sidecar and metadata atomically to `path` (default: self.path)."""
+        self.path = path or self.path
+        os.makedirs(self.path, exist_ok=True)
+        self._consolidate()
+        count = len(self._ids)
+        dim = int(self._vectors.shape[1]) if self._vectors is not None else 0
+
+        vectors_tmp = os.path.join(self.path, VECTORS_FILE + ".tmp")
+        if self._vectors is not None:
+            np.ascontiguousarray(self._vectors, dtype=np.float32).tofile(vectors_tmp)
+        else:
+            open(vectors_tmp, "wb").close()
+
+        docs_tmp = os.path.join(self.path, DOCS_FILE + ".tmp")
+        with open(docs_tmp, "w", encoding="utf-8") as f:
+            for doc_id, doc in zip(self._ids, self._docs):
+                f.write(json.dumps({"id": doc_id, **doc}, ensure_ascii=False) + "\n")
+
+        meta_tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({"count": count, "dim": dim}, f)
+
+        # Drop our own memory map before replacing the file underneath it
+        if isinstance(self._vectors, np.memmap):
+            self._vectors = np.array(self._vectors)
+        os.replace(vectors_tmp, os.path.join(self.path, VECTORS_FILE))
+        os.replace(docs_tmp, os.path.join(self.path, DOCS_FILE))
+        os.replace(meta_tmp, os.path.join(self.path, META_FILE))
+
+        if self.ann is not None:
+            self.ann.save(self.path)
+        else:
+            IVFIndex.remove(self.path)
+        logger.info(f"Persisted {count} vectors to {self.path}")
+
+    def build_ann_index(self, n_lists: int = None, nprobe: int = None):
+        """Build an IVF index over the current vectors (persisted by the next persist())."""
+        self._consolidate()
+        if self._vectors is None or not len(self._ids):
+            self.ann = None
+            return None
+        self.ann = IVFIndex.build(self._vectors, n_lists=n_lists)
+        if nprobe:
+            self.ann.nprobe = nprobe
+        return self.ann
+
+    # Writes
+
+    def _consolidate(self):
+        """Fold rows appended since the last search/persist into the main matrix."""
+        if not self._pending:
+            return
+        if self._vectors is None:
+            self._vectors = np.vstack(self._pending)
+        else:
+            self._vectors = np.vstack([self._vectors] + self._pending)
+        self._pending = []
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """Upsert precomputed embeddings; existing ids are overwritten in place."""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        if not texts:
+            return []
+
+        new_vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        append_rows, update_rows = [], []
+        for i, doc_id in enumerate(ids):
+            doc = {"text": texts[i], "metadata": metadatas[i]}
+            row = self._row.get(doc_id)
+            if row is None:
+                self._row[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._docs.append(doc)
+                append_rows.append(i)
+            else:
+                self._docs[row] = doc
+                update_rows.append((row, i))
+
+        if update_rows:
+            self._consolidate()
+            # Copy out of a read-only memory map before writing
+            self._vectors = np.array(self._vectors)
+            for row, i in update_rows:
+                self._vectors[row] = new_vectors[i]
+        if append_rows:
+            # Appends are buffered so bulk loads don't copy the matrix per batch
+            self._pending.append(new_vectors[append_rows])
+
+        # Row ids changed; the IVF index has to be rebuilt
+        self.ann = None
+        return ids
+
+    def update_metadata(self, doc_id: str, metadata: dict):
+        """Merge `metadata` into a stored chunk's metadata; unknown ids are ignored."""
+        row = self._row.get(doc_id)
+        if row is not None:
+            self._docs[row]["metadata"].update(metadata)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids=None, **kwargs):
+        self._consolidate()
+        if not ids or self._vectors is None:
+            return True
+        drop = {self._row[i] for i in ids if i in self._row}
+        if not drop:
+            return True
+
+        keep = [r for r in range(len(self._ids)) if r not in drop]
+        self._vectors = np.array(self._vectors)[keep]
+        self._ids = [self._ids[r] for r in keep]
+        self._docs = [self._docs[r] for r in keep]
+        self._row = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        self.ann = None
+        return True
+
+    def clear(self):
+        self._ids, self._docs, self._row = [], [], {}
+        self._vectors = None
+        self._pending = []
+        self.ann = None
+
+    def get_by_ids(self, ids):
+        return [self._document(self._row[i]) for i in ids if i in self._row]
+
+    # Search
+
+    def _document(self, row):
+        doc = self._docs[row]
+        return Document(id=self._ids[row], page_content=doc["text"], metadata=doc["metadata"])
+
+    def top_k(self, embedding, k: int = 4, exact: bool = False):
+        """Top-k rows and cosine scores for a query vector (approximate when an IVF index exists)."""
+        self._consolidate()
+        if self._vectors is None or not len(self._ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if self.ann is not None and not exact:
+            return self.ann.search(self._vectors, query, k)
+
+        scores = self._vectors @ query
+        k = min(k, scores.shape[0])
+        if k < scores.shape[0]:
+            rows = np.argpartition(-scores, k - 1)[:k]
+        else:
+            rows = np.arange(scores.shape[0])
+        rows = rows[np.argsort(-scores[rows])]
+        return rows, scores[rows]
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, **kwargs):
+        rows, scores = self.top_k(embedding, k)
+        return [(self._document(int(r)), float(s)) for r, s in zip(rows, scores)]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path: str = None, **kwargs):
+        # Always a fresh build; use add_texts on a loaded store to upsert
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        if path:
+            store.persist(path)
+        return store
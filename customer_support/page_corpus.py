@@ -0,0 +1,133 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+import requests
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from http_utils import build_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), "data", "corpus")
+# Response headers worth keeping alongside the body
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Date", "Content-Language")
+
+
+class PageCorpus:
+    """
+    Fetch-once, on-disk corpus of raw pages shared by the crawler, the URL
+    validator and ingest. Bodies are gzip-compressed and content-addressed
+    (`objects/<sha[:2]>/<sha>.html.gz`, so identical pages are stored once);
+    a SQLite index maps each URL to its body hash, status and headers.
+    """
+
+    def __init__(self, path: str = DEFAULT_CORPUS_DIR):
+        self.path = path
+        self.objects_dir = os.path.join(path, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                sha TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def _object_path(self, sha: str) -> str:
+        return os.path.join(self.objects_dir, sha[:2], f"{sha}.html.gz")
+
+    def put(self, url: str, status: int, headers, body: bytes) -> str:
+        """Store a fetched page and return its content hash."""
+        sha = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(sha)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp = f"{object_path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                f.write(body)
+            os.replace(tmp, object_path)
+
+        kept = {name: headers[name] for name in KEPT_HEADERS if name in headers}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, sha, status, headers, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, sha, status, json.dumps(kept), time.time()),
+            )
+            self._conn.commit()
+        return sha
+
+    def meta(self, url: str):
+        """Status, headers and body hash for a URL without reading the body, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha, status, headers, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"url": url, "sha": row[0], "status": row[1], "headers": json.loads(row[2]), "fetched_at": row[3]}
+
+    def has(self, url: str) -> bool:
+        return self.meta(url) is not None
+
+    def body(self, sha: str) -> bytes:
+        with gzip.open(self._object_path(sha), "rb") as f:
+            return f.read()
+
+    def get(self, url: str):
+        """Stored page as a dict with `html` (decoded body) added, or None."""
+        meta = self.meta(url)
+        if meta is None:
+            return None
+        meta["html"] = self.body(meta["sha"]).decode("utf-8", errors="replace")
+        return meta
+
+    def fetch(self, url: str, session=None, timeout: int = 10):
+        """
+        Return a page from the corpus, downloading (and storing) it only if it
+        is not there yet. This is the single network entry point for ingest.
+        Only 200 responses are stored; any other response is returned with
+        its status but retried on the next call instead of being kept forever.
+        """
+        meta = self.meta(url)
+        # Older corpora may hold error responses; those are fetched again
+        if meta is not None and meta["status"] == 200:
+            return self.get(url)
+
+        session = session or build_session()
+        try:
+            resp = session.get(url, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Error fetching {url}: {e}")
+            return None
+        if resp.status_code != 200:
+            logger.warning(f"Error fetching {url}: HTTP {resp.status_code}")
+            return {"url": url, "status": resp.status_code, "headers": dict(resp.headers), "html": ""}
+        self.put(url, resp.status_code, resp.headers, resp.content)
+        return self.get(url)
+
+
+def page_to_document(page) -> Document:
+    """Turn a stored page into a Document, mirroring what WebBaseLoader extracts."""
+    soup = BeautifulSoup(page["html"], "html.parser")
+    metadata = {"source": page["url"]}
+    if soup.title and soup.title.string:
+        metadata["title"] = soup.title.get_text()
+    description = soup.find("meta", attrs={"name": "description"})
+    if description and description.get("content"):
+        metadata["description"] = description["content"]
+    html_tag = soup.find("html")
+    if html_tag and html_tag.get("lang"):
+        metadata["language"] = html_tag["lang"]
+    return Document(page_content=soup.get_text(), metadata=metadata)
+
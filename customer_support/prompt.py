@@ -241,3 +241,18 @@ Important rules:
 
 Remember: Your goal is to understand what the user actually needs help with, how urgently they need it, and how they're feeling about the situation.
 """
+
+
+# Single-pass mode: the classification tasks above plus answering from retrieved context
+classify_and_answer_prompt = classifier_prompt + """
+
+3. Answer:
+   - Answer the question using ONLY the context below. If the context is empty or unrelated to the question, answer "I don't know." and return no sources.
+   - Do NOT invent or assume anything beyond the context, and never use outside knowledge.
+   - Insert citations inline in the format (Source: <url>) right after the information they support, and list the URLs you used in `sources`.
+   - Return code snippets inside markdown code blocks.
+
+Source urls: {source}
+Context:
+{context}
+"""
@@ -1,13 +1,17 @@
 import os
+import time
 import logging
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from state import State
 from schema import AnswerWithSources
 from prompt import retriever_content
+from answer_cache import AnswerCache
+from resources import get_chat_model, get_embedder
+from vector_store import open_vector_store
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from context_builder import ContextBuilder
 import streamlit as st
 
 logging.basicConfig(level=logging.INFO)
@@ -27,59 +31,164 @@ os.environ["PINECONE_ENV"] = os.getenv("PINECONE_ENV")
 
 
 class RAGAgent:
-    def __init__(self, index_name: str, model: str = "gpt-4o-mini"):
+    def __init__(self, index_name: str, model: str = "gpt-4o-mini", answer_cache_threshold: float = 0.92,
+                 backend: str = None, hybrid: bool = True, k: int = 4, fetch_k: int = 20,
+                 context_token_budget: int = 700):
         self.index_name = index_name
         self.model = model
-
-        # Embeddings and LLM
-        self.embedder = OpenAIEmbeddings(model="text-embedding-3-small")
-        self.llm = ChatOpenAI(temperature=0.7, model_name=self.model)
-
-        # Connect to Pinecone
-        self.pc = Pinecone(api_key=os.getenv("pinecone_api_key"))
-        # self.pc = Pinecone(api_key=st.secrets["pinecone_api_key"])
-        # Attach to an existing Pinecone index
-        self.vector_store = PineconeVectorStore.from_existing_index(
-            index_name=self.index_name,
-            embedding=self.embedder
+        self.k = k
+        self.fetch_k = fetch_k
+
+        # Embeddings and LLM (shared, process-wide clients)
+        self.embedder = get_embedder("text-embedding-3-small")
+        self.llm = get_chat_model(self.model, 0.7)
+        # Built once and reused for every request
+        self.answer_llm = self.llm.with_structured_output(AnswerWithSources)
+
+        # Attach to an existing index (Pinecone or local, see VECTOR_BACKEND)
+        self.vector_store = open_vector_store(self.index_name, self.embedder, backend)
+
+        # BM25 index built by ingest; dense and lexical results are fused by rank
+        self.lexical_index = BM25Index.open(index_name) if hybrid else None
+        if hybrid and self.lexical_index is None:
+            logger.warning(f"No BM25 index for `{index_name}`; retrieval is dense-only until ingest.py is re-run")
+
+        # Re-ranks and packs over-fetched candidates into a token budget (None: top-k as retrieved)
+        self.context_builder = (
+            ContextBuilder(token_budget=context_token_budget, baseline_k=k) if context_token_budget else None
         )
 
+        # Semantic answer cache in front of retrieval/generation (None disables it)
+        self.answer_cache = AnswerCache(index_name, threshold=answer_cache_threshold) if answer_cache_threshold else None
+
+        # Compiled once; build() still returns a fresh graph for scripts
+        self.graph = self.build()
+
+    #Semantic cache lookup
+    def check_cache(self, state: State):
+        question_embedding = state.get("question_embedding") or self.embedder.embed_query(state["question"])
+        update = {
+            "question_embedding": question_embedding,
+            "cache_hit": False,
+            "rag_started_at": time.perf_counter(),
+        }
+        if self.answer_cache is None:
+            return update
+
+        cached = self.answer_cache.lookup(question_embedding)
+        if cached is None:
+            return update
+
+        answer, similarity = cached
+        logger.info(f"Answer cache hit (similarity {similarity:.3f})")
+        self.answer_cache.record_hit()
+        return {
+            **update,
+            "cache_hit": True,
+            "answer": AnswerWithSources(**answer),
+            "context": [],
+            "sources": answer["sources"],
+        }
+
+    def route_cache(self, state: State):
+        return "hit" if state.get("cache_hit") else "miss"
+
     #Retrieval 
+    def search(self, question: str, question_embedding):
+        """Candidate chunks for a question: dense, or dense and BM25 fused when hybrid."""
+        # With context assembly, over-fetch and let generate pick what fits
+        k = self.fetch_k if self.context_builder else self.k
+        if self.lexical_index is None:
+            return self.vector_store.similarity_search_by_vector(question_embedding, k=k)
+
+        dense = self.vector_store.similarity_search_by_vector(question_embedding, k=k)
+        # A BM25 query is a few array slices (well under a millisecond), so it runs
+        # inline rather than through a pool every concurrent request would contend for
+        lexical = [doc for doc, _ in self.lexical_index.search(question, k)]
+        return reciprocal_rank_fusion([dense, lexical], limit=k)
+
     def retrieve(self, state: State):
-        retrieved_docs = self.vector_store.similarity_search(state["question"])
+        if state.get("context"):
+            # Already fetched speculatively while the ticket was being classified
+            logger.info(f"Using {len(state['context'])} prefetched documents.")
+            return {}
+
+        # Reuse the embedding computed for the cache lookup instead of embedding the question again
+        retrieved_docs = self.search(state["question"], state["question_embedding"])
 
         logger.info(f"Retrieved {len(retrieved_docs)} documents for the query.")
         return {"context": retrieved_docs}
 
     #Generation
-    def generate(self, state: State):
+    def assemble_context(self, question: str, candidates):
+        """Pick the passages for the prompt and return (context, source URLs, joined context text)."""
+        context = candidates
+        if self.context_builder is not None:
+            context, stats = self.context_builder.build(question, candidates)
+            logger.info(
+                f"Context: {stats['selected']}/{stats['candidates']} passages, {stats['context_tokens']} tokens "
+                f"({stats['tokens_saved']} fewer than the top-{self.k} baseline)"
+            )
+
         sources = []
-        for doc in state["context"]:
+        for doc in context:
             if hasattr(doc, "metadata") and "source" in doc.metadata:
                 source_url = doc.metadata["source"]
                 if source_url not in sources:
                     sources.append(source_url)
                     print(f"Source URL: {source_url}")
 
-        docs_content = "\n\n".join(doc.page_content for doc in state["context"])
+        docs_content = "\n\n".join(doc.page_content for doc in context)
+        return context, sources, docs_content
+
+    def generate(self, state: State, config: RunnableConfig = None):
+        context, sources, docs_content = self.assemble_context(state["question"], state["context"])
         formatted_prompt = retriever_content.format(
             context=docs_content,
             question=state["question"],
             source=sources
         )
 
-        logger.info(f"Formatted generation prompt: {formatted_prompt}")
-        structured_llm = self.llm.with_structured_output(AnswerWithSources)
-        result = structured_llm.invoke(formatted_prompt)
-
-        return {"answer": result, "sources": sources}
+        logger.debug(f"Formatted generation prompt: {formatted_prompt}")
+        if (config or {}).get("configurable", {}).get("stream_answer"):
+            # Structured output arrives as tool-call JSON, so streaming callers
+            # get plain text token by token and the sources from the context
+            message = self.llm.invoke(formatted_prompt, config)
+            result = AnswerWithSources(answer=message.content, sources=sources)
+        else:
+            result = self.answer_llm.invoke(formatted_prompt)
+
+        return {"answer": result, "sources": sources, "context": context}
+
+    #Cache store
+    def store_answer(self, state: State):
+        if self.answer_cache is None:
+            return {}
+
+        self.answer_cache.record_miss(time.perf_counter() - state["rag_started_at"])
+        answer = state["answer"]
+        # "I don't know" style answers without sources are not worth reusing
+        if answer.sources:
+            self.answer_cache.store(state["question"], state["question_embedding"], answer.model_dump())
+        return {}
 
     #Build Graph
     def build(self):
         subgraph = StateGraph(State)
+        subgraph.add_node("check_cache", self.check_cache)
         subgraph.add_node("retrieve", self.retrieve)
         subgraph.add_node("generate", self.generate)
-        subgraph.add_edge(START, "retrieve")
+        subgraph.add_node("store_answer", self.store_answer)
+        subgraph.add_edge(START, "check_cache")
+        subgraph.add_conditional_edges(
+            "check_cache",
+            self.route_cache,
+            {
+                "hit": END,
+                "miss": "retrieve",
+            }
+        )
         subgraph.add_edge("retrieve", "generate")
-        subgraph.add_edge("generate", END)
+        subgraph.add_edge("generate", "store_answer")
+        subgraph.add_edge("store_answer", END)
         return subgraph.compile()
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills at
+    `capacity` tokens per `period` seconds. Thread-safe.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return how many seconds to wait before using them."""
+        # A single request larger than the bucket can never fit; cap it so it
+        # waits for a full bucket instead of blocking forever.
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits, usable from threads or asyncio."""
+
+    def __init__(self, requests_per_minute: int = 500, tokens_per_minute: int = 200_000):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for rate limiting."""
+    return len(text) // 4 + 1
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for rate-limit (429), server-side (5xx) and connection/timeout errors."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        # Pinecone exceptions carry the HTTP status as `status`
+        status = getattr(exc, "status", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError", "Timeout", "ConnectionError")
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry(fn, max_retries: int = 5, base_delay: float = 1.0):
+    """Call `fn()` and retry retryable errors with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay)
+            logger.warning(f"Retryable error ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def aretry(fn, max_retries: int = 5, base_delay: float = 1.0):
+    """Await `fn()` and retry retryable errors with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay)
+            logger.warning(f"Retryable error ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,86 @@
+import logging
+import os
+import threading
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from pinecone import Pinecone
+from embedding_cache import CachedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """
+    Process-wide registry of warm resources (LLM clients, embeddings, vector
+    stores, compiled graphs). Each resource is built once on first use and then
+    shared by every caller in the process, including all Streamlit sessions.
+    """
+
+    def __init__(self):
+        self._resources = {}
+        # Re-entrant so a factory can itself request other resources.
+        self._lock = threading.RLock()
+
+    def get(self, key, factory):
+        """Return the resource stored under `key`, building it with `factory` on first use."""
+        if key in self._resources:
+            return self._resources[key]
+
+        with self._lock:
+            if key not in self._resources:
+                logger.info(f"Warming resource: {key}")
+                self._resources[key] = factory()
+            return self._resources[key]
+
+    def loaded(self):
+        """Keys of all resources built so far."""
+        return list(self._resources)
+
+    def clear(self):
+        with self._lock:
+            self._resources.clear()
+
+
+registry = ResourceRegistry()
+
+
+def get_chat_model(model: str = "gpt-4o-mini", temperature: float = 0.7):
+    return registry.get(
+        ("chat_model", model, temperature),
+        lambda: ChatOpenAI(temperature=temperature, model_name=model),
+    )
+
+
+def get_embedder(model: str = "text-embedding-3-small"):
+    """OpenAI embeddings behind the shared on-disk embedding cache."""
+    return registry.get(
+        ("embedder", model),
+        lambda: CachedEmbeddings(OpenAIEmbeddings(model=model), model),
+    )
+
+
+def get_pinecone_client():
+    return registry.get(
+        ("pinecone",),
+        lambda: Pinecone(api_key=os.getenv("pinecone_api_key")),
+    )
+
+
+def get_rag_agent(index_name: str = "atlandb", model: str = "gpt-4o-mini"):
+    # Imported lazily: rag_builder itself pulls its clients from this registry.
+    from rag_builder import RAGAgent
+
+    return registry.get(
+        ("rag_agent", index_name, model),
+        lambda: RAGAgent(index_name, model=model),
+    )
+
+
+def get_support_agent(model: str = "gpt-4o-mini", temperature: float = 0.7, index_name: str = "atlandb",
+                      graph_mode: str = "speculative"):
+    from customer_support_agent import CustomerSupportAgent
+
+    return registry.get(
+        ("support_agent", model, temperature, index_name, graph_mode),
+        lambda: CustomerSupportAgent(model=model, temperature=temperature, index_name=index_name,
+                                     graph_mode=graph_mode),
+    )
@@ -24,3 +24,9 @@ class TicketClassificationModel(BaseModel):
     ]] = Field(..., description="One or more topic tags relevant to the ticket")
     sentiment: Literal["Frustrated", "Curious", "Angry", "Neutral"]
     priority: Literal["P0", "P1", "P2"]
+
+
+class TicketAnswerModel(TicketClassificationModel):
+    """Classification fields plus the answer to the ticket, produced in one pass."""
+    answer: str = Field(..., description="Answer to the question, using only the provided context, with inline citations")
+    sources: List[str] = Field(..., description="URLs from the provided context that the answer relies on")
@@ -0,0 +1,178 @@
+import os
+import asyncio
+import logging
+import argparse
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, field_validator
+from resources import get_support_agent, registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tickets processed at once; the rest wait (and count against their timeout)
+MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "32"))
+REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "60"))
+GRAPH_MODE = os.getenv("SERVER_GRAPH_MODE", "speculative")
+
+
+class TicketRequest(BaseModel):
+    question: str = Field(..., description="The ticket text / user question")
+
+    @field_validator("question")
+    @classmethod
+    def not_blank(cls, value: str) -> str:
+        # Whitespace-only tickets are rejected with a 422 instead of being routed
+        value = value.strip()
+        if not value:
+            raise ValueError("question must not be empty")
+        return value
+
+
+class Service:
+    """Warm agent plus the concurrency gate shared by all requests."""
+
+    def __init__(self):
+        self.agent = None
+        self.error = None
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        self.in_flight = 0
+
+    async def warm(self):
+        try:
+            # Building the agent loads clients, indexes and compiled graphs; keep the loop free meanwhile
+            self.agent = await asyncio.to_thread(get_support_agent, graph_mode=GRAPH_MODE)
+            logger.info("Support agent is warm")
+        except Exception as e:
+            logger.error(f"Failed to warm the support agent: {e}")
+            self.error = str(e)
+
+    def _release(self, task):
+        """Done-callback of a request's work: frees its slot once the work has really finished."""
+        self.in_flight -= 1
+        self.semaphore.release()
+        if not task.cancelled():
+            # Marks any exception as retrieved; a caller that timed out never awaits it
+            task.exception()
+
+    async def run(self, coro_factory):
+        """Run one request under the concurrency limit and timeout, mapping failures to HTTP errors."""
+        if self.agent is None:
+            raise HTTPException(status_code=503, detail=self.error or "Agent is still warming up")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REQUEST_TIMEOUT
+        timed_out = HTTPException(status_code=504, detail=f"Timed out after {REQUEST_TIMEOUT:.0f}s")
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise timed_out
+
+        # Sync graph nodes cannot be interrupted in their worker thread, so the
+        # slot is released when the work ends, not when the request gives up
+        # on it; timed-out runs keep counting against the limit until then
+        self.in_flight += 1
+        task = asyncio.ensure_future(coro_factory(self.agent))
+        task.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            raise timed_out
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+service = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global service
+    # Sync nodes run on the default executor under ainvoke; size it for the concurrency limit
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=MAX_CONCURRENCY * 2))
+    service = Service()
+    warming = asyncio.create_task(service.warm())
+    yield
+    warming.cancel()
+
+
+app = FastAPI(title="Atlan Customer Support Agent", lifespan=lifespan)
+
+
+def _classification(state: dict) -> dict:
+    return {key: state.get(key) for key in ("subject", "body", "topic_tags", "sentiment", "priority")}
+
+
+def _answer(state: dict) -> dict:
+    answer = state.get("answer")
+    return {
+        "answer": answer.answer if answer else None,
+        "sources": answer.sources if answer else [],
+        "cache_hit": bool(state.get("cache_hit")),
+    }
+
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once the agent and its warm resources are loaded, 503 before."""
+    body = {
+        "ready": service is not None and service.agent is not None,
+        "error": service.error if service else None,
+        "resources": [":".join(map(str, key)) for key in registry.loaded()],
+        "in_flight": service.in_flight if service else 0,
+        "max_concurrency": MAX_CONCURRENCY,
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.post("/classify")
+async def classify(request: TicketRequest):
+    """Topic tags, sentiment and priority only."""
+    state = await service.run(
+        lambda agent: asyncio.to_thread(agent.TicketClassifier, {"question": request.question})
+    )
+    return _classification(state)
+
+
+@app.post("/answer")
+async def answer(request: TicketRequest):
+    """RAG answer with sources, without classification."""
+    state = await service.run(lambda agent: agent.rag_agent.graph.ainvoke({"question": request.question}))
+    return _answer(state)
+
+
+@app.post("/tickets")
+async def process_ticket(request: TicketRequest):
+    """Full pipeline: classification, routing and the answer (or team assignment)."""
+    state = await service.run(lambda agent: agent.graph.ainvoke({"question": request.question}))
+    return {**_classification(state), **_answer(state)}
+
+
+@app.get("/metrics")
+async def metrics():
+    if service is None or service.agent is None:
+        raise HTTPException(status_code=503, detail="Agent is still warming up")
+    return service.agent.metrics()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the support agent over HTTP")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # One process: the warm agent and its caches are shared by every request
+    uvicorn.run(app, host=args.host, port=args.port, workers=1)
@@ -6,6 +6,9 @@ class State(TypedDict):
     question: str
     context: List[Document]
     answer: AnswerWithSources
+    question_embedding: List[float]
+    cache_hit: bool
+    rag_started_at: float
     id: str               
     subject: str          
     body: str             
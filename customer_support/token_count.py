@@ -0,0 +1,16 @@
+from rate_limiter import estimate_tokens
+
+try:
+    import tiktoken
+
+    # Encoding shared by text-embedding-3-* and gpt-4o-mini era chat models
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable offline
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, otherwise a ~4 chars/token estimate."""
+    if _encoding is None:
+        return estimate_tokens(text)
+    return len(_encoding.encode(text, disallowed_special=()))
@@ -1,57 +1,137 @@
 # validate_urls.py
 import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 import requests
 import os
+from http_utils import SNIPPET_BYTES, HostPoliteness, build_session, looks_like_error
+from page_corpus import PageCorpus
 
+# HEAD answers that don't mean the page is broken, just that HEAD isn't supported
+HEAD_UNSUPPORTED = {403, 405, 501}
 
-class URLValidator:
-    def __init__(self):
-        pass
 
-    def fetch_page(self, url):
-        """Try to fetch a page, return True if valid HTML, False otherwise."""
+class URLValidator:
+    def __init__(self, max_workers: int = 16, timeout: int = 10, session=None, politeness=None,
+                 corpus: PageCorpus = None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = session or build_session(pool_size=max_workers)
+        self.politeness = politeness or HostPoliteness()
+        # Pages already in the corpus are validated offline
+        self.corpus = corpus
+        # Per-URL results of the last validate_urls call
+        self.report = []
+
+    def _read_snippet(self, url):
+        """
+        GET only the first SNIPPET_BYTES of the page with a Range request.
+        A ranged (206) body is read to the end so the connection goes back to
+        the pool; servers that ignore Range send the whole page, which is cut
+        off after the snippet at the cost of that connection.
+        """
+        headers = {"Range": f"bytes=0-{SNIPPET_BYTES - 1}"}
+        with self.session.get(url, timeout=self.timeout, headers=headers, stream=True) as resp:
+            snippet = resp.raw.read(SNIPPET_BYTES, decode_content=True) if resp.ok else b""
+            if resp.status_code == 206:
+                for _ in resp.iter_content(chunk_size=SNIPPET_BYTES):
+                    pass
+            return resp, snippet.decode(resp.encoding or "utf-8", errors="ignore")
+
+    def _check_stored(self, page, result):
+        """Validate a page from the corpus without touching the network."""
+        result["status"] = page["status"]
+        result["latency_ms"] = 0.0
+        if page["status"] >= 400:
+            result["reason"] = f"HTTP {page['status']} (corpus)"
+        elif "text/html" not in page["headers"].get("Content-Type", ""):
+            result["reason"] = "non-HTML content (corpus)"
+        elif looks_like_error(page["html"]):
+            result["reason"] = "error-like content (corpus)"
+        else:
+            result["valid"] = True
+            result["reason"] = "ok (corpus)"
+        return result
+
+    def check_url(self, url):
+        """
+        Validate one URL: from the corpus if it holds the page, otherwise HEAD
+        first, then a ranged GET of at most 10 KB for error-signature
+        detection. Returns a report dict with the status code, latency and
+        reason.
+        """
+        result = {"url": url, "valid": False, "status": None, "latency_ms": None, "reason": ""}
+        page = self.corpus.get(url) if self.corpus else None
+        if page is not None:
+            return self._check_stored(page, result)
+
+        host = urlparse(url).netloc
+        start = time.perf_counter()
+        self.politeness.acquire(host)
         try:
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-
-            if "text/html" not in resp.headers.get("Content-Type", ""):
-                return False
-
-            # ✅ Only check the first 10 KB for error-like signatures
-            snippet = resp.text[:10000].lower()
-            error_signatures = [
-                "404 - not found",
-                "page not found",
-                "error 404",
-            ]
-
-            if any(sig in snippet for sig in error_signatures):
-                print(f" Skipping {url} (error-like content)")
-                return False
-
-            return True
+            head = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            result["status"] = head.status_code
+
+            if head.status_code not in HEAD_UNSUPPORTED:
+                if head.status_code >= 400:
+                    result["reason"] = f"HTTP {head.status_code}"
+                    return result
+                content_type = head.headers.get("Content-Type", "")
+                if content_type and "text/html" not in content_type:
+                    result["reason"] = f"non-HTML content ({content_type})"
+                    return result
+
+            resp, snippet = self._read_snippet(url)
+            result["status"] = resp.status_code
+            if not resp.ok:
+                result["reason"] = f"HTTP {resp.status_code}"
+            elif "text/html" not in resp.headers.get("Content-Type", ""):
+                result["reason"] = "non-HTML content"
+            elif looks_like_error(snippet):
+                result["reason"] = "error-like content"
+            else:
+                result["valid"] = True
+                result["reason"] = "ok"
 
         except requests.exceptions.RequestException as e:
-            print(f" Error fetching {url}: {e}")
-        return False
+            result["reason"] = f"{type(e).__name__}: {e}"
+        finally:
+            self.politeness.release(host)
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def fetch_page(self, url):
+        """Try to fetch a page, return True if valid HTML, False otherwise."""
+        return self.check_url(url)["valid"]
 
     def validate_urls(self, urls):
-        """Return only URLs that fetch successfully."""
+        """Return only URLs that fetch successfully (in input order), checking them in parallel."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            self.report = list(pool.map(self.check_url, urls))
+
         valid_urls = []
-        for url in urls:
-            if self.fetch_page(url):
-                print(f" Valid URL: {url}")
-                valid_urls.append(url)
+        for result in self.report:
+            if result["valid"]:
+                print(f" Valid URL: {result['url']}")
+                valid_urls.append(result["url"])
             else:
-                print(f"Removing dead URL: {url}")
+                print(f"Removing dead URL: {result['url']} ({result['reason']})")
         return valid_urls
 
 
 if __name__ == "__main__":
-    validator = URLValidator()
+    parser = argparse.ArgumentParser(description="Validate crawled URLs")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--no-corpus", action="store_true", help="Always check over the network")
+    args = parser.parse_args()
+
+    validator = URLValidator(max_workers=args.workers, corpus=None if args.no_corpus else PageCorpus())
 
     input_file = os.path.join("data", "all_urls.json")
     output_file = os.path.join("data", "valid_urls.json")
+    report_file = os.path.join("data", "url_report.json")
 
     # Load all URLs
     with open(input_file, "r", encoding="utf-8") as f:
@@ -60,12 +140,16 @@ if __name__ == "__main__":
     print(f"\nLoaded {len(all_urls)} URLs from {input_file}")
 
     # Validate them
+    start = time.perf_counter()
     valid_urls = validator.validate_urls(all_urls)
 
-    print(f"\nTotal valid URLs: {len(valid_urls)}")
+    print(f"\nTotal valid URLs: {len(valid_urls)} in {time.perf_counter() - start:.1f}s")
 
     # Save valid URLs
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(valid_urls, f, indent=2)
 
-    print(f"\n✅ Saved {len(valid_urls)} valid URLs to {output_file}")
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(validator.report, f, indent=2)
+
+    print(f"\n✅ Saved {len(valid_urls)} valid URLs to {output_file} and per-URL report to {report_file}")
@@ -0,0 +1,122 @@
+import os
+import logging
+from langchain_core.documents import Document
+from langchain_pinecone import PineconeVectorStore
+from local_vector_store import LocalVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Select the backend with VECTOR_BACKEND=pinecone|local
+DEFAULT_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_VECTOR_DIR = os.getenv(
+    "LOCAL_VECTOR_DIR", os.path.join(os.path.dirname(__file__), "data", "vectors")
+)
+BACKENDS = ("pinecone", "local")
+# Below this many vectors exact search is already a few milliseconds
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "20000"))
+
+
+def resolve_backend(backend: str = None) -> str:
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector backend `{backend}`; expected one of {BACKENDS}")
+    return backend
+
+
+def local_store_path(index_name: str) -> str:
+    return os.path.join(LOCAL_VECTOR_DIR, index_name)
+
+
+# Pinecone accepts at most 1000 ids per delete request
+DELETE_BATCH_SIZE = 1000
+# Fetch ids travel in the query string, so keep those requests smaller
+FETCH_BATCH_SIZE = 100
+
+
+def open_vector_store(index_name: str, embedding, backend: str = None, create: bool = False):
+    """Attach to an existing index; with `create`, a missing local index starts out empty."""
+    backend = resolve_backend(backend)
+    logger.info(f"Opening `{index_name}` on the {backend} vector backend")
+
+    if backend == "local":
+        path = local_store_path(index_name)
+        if not os.path.exists(path) and not create:
+            raise FileNotFoundError(f"No local vector index at {path}; run ingest.py with VECTOR_BACKEND=local")
+        return LocalVectorStore(embedding, path=path)
+
+    return PineconeVectorStore.from_existing_index(index_name=index_name, embedding=embedding)
+
+
+def delete_vectors(store, ids):
+    """Delete vectors by id, in batches the backend accepts."""
+    ids = list(ids)
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        store.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
+
+
+def clear_vector_store(store):
+    """Remove every vector from the index."""
+    if isinstance(store, LocalVectorStore):
+        store.clear()
+        return
+    try:
+        store.delete(delete_all=True)
+    except Exception as e:
+        # Serverless indexes reject delete_all on an empty namespace
+        logger.warning(f"Could not clear index: {e}")
+
+
+def count_vectors(store) -> int:
+    """Number of vectors currently in the index."""
+    if isinstance(store, LocalVectorStore):
+        return len(store)
+    return store._index.describe_index_stats().total_vector_count
+
+
+def finalize_vector_store(store, ann: bool = True):
+    """Flush a local index to disk (rebuilding its IVF index); Pinecone writes are already durable."""
+    if isinstance(store, LocalVectorStore):
+        if ann and len(store) >= ANN_MIN_VECTORS:
+            store.build_ann_index()
+        store.persist()
+
+
+def upsert_vectors(store, ids, vectors, documents):
+    """Write precomputed embeddings (no re-embedding) under the given ids."""
+    texts = [doc.page_content for doc in documents]
+    metadatas = [doc.metadata for doc in documents]
+
+    if isinstance(store, LocalVectorStore):
+        store.add_embeddings(texts, vectors, metadatas, ids)
+        return
+
+    # PineconeVectorStore keeps the chunk text in metadata under its text key
+    store._index.upsert(vectors=[
+        {"id": doc_id, "values": vector, "metadata": {**metadata, store._text_key: text}}
+        for doc_id, vector, text, metadata in zip(ids, vectors, texts, metadatas)
+    ])
+
+
+def update_metadata(store, updates):
+    """Merge metadata into already-written vectors, given {id: metadata}."""
+    for doc_id, metadata in updates.items():
+        if isinstance(store, LocalVectorStore):
+            store.update_metadata(doc_id, metadata)
+        else:
+            store._index.update(id=doc_id, set_metadata=metadata)
+
+
+def fetch_documents(store, ids):
+    """Stored chunks (text and metadata) for the given ids; missing ids are skipped."""
+    ids = list(ids)
+    if isinstance(store, LocalVectorStore):
+        return store.get_by_ids(ids)
+
+    documents = []
+    for start in range(0, len(ids), FETCH_BATCH_SIZE):
+        response = store._index.fetch(ids=ids[start:start + FETCH_BATCH_SIZE])
+        for doc_id, vector in response.vectors.items():
+            metadata = dict(vector.metadata or {})
+            text = metadata.pop(store._text_key, "")
+            documents.append(Document(id=doc_id, page_content=text, metadata=metadata))
+    return documents